@@ -0,0 +1,31 @@
+"""
+Run heroku-audit against a mock Heroku API server (see `mock_heroku.py`).
+
+    python benchmarks/cli.py http://127.0.0.1:8000 postgres major-version
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_heroku import redirect_to  # noqa: E402
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+
+    server_url, args = sys.argv[1], sys.argv[2:]
+
+    os.environ.setdefault("HEROKU_API_KEY", "benchmark")
+
+    with redirect_to(server_url):
+        from heroku_audit.cli import app
+
+        app(args, prog_name="heroku-audit")
+
+
+if __name__ == "__main__":
+    main()
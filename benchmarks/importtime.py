@@ -0,0 +1,119 @@
+"""
+Measure how long heroku-audit takes to start, using `python -X importtime`.
+
+Each invocation runs in a fresh process, and reports the time spent importing
+modules, the wall-clock time (including interpreter startup), and the slowest
+top-level imports. With `--budget`, exits with an error if any invocation
+spends longer importing than allowed, so regressions can be caught in CI.
+
+    python benchmarks/importtime.py
+    python benchmarks/importtime.py --command=--version --budget 100
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+DEFAULT_COMMANDS = ["--version", "--help", "--list", "env --help"]
+
+# `import time: self [us] | cumulative | imported package`
+IMPORTTIME_RE = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<indent>\s*)(?P<module>\S+)$"
+)
+
+
+def run_command(args: list[str]) -> tuple[float, dict[str, float]]:
+    """
+    Run heroku-audit, returning its wall-clock time and the cumulative import
+    time of each top-level import, in seconds.
+    """
+    env = {**os.environ, "HEROKU_API_KEY": "benchmark", "PYTHONDONTWRITEBYTECODE": ""}
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "heroku_audit", *args],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    duration = time.perf_counter() - start
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match and not match["indent"]:
+            imports[match["module"]] = int(match["cumulative"]) / 1_000_000
+
+    return duration, imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--command",
+        action="append",
+        help=f"Arguments to run heroku-audit with (default {DEFAULT_COMMANDS})",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs per command, taking the median"
+    )
+    parser.add_argument(
+        "--top", type=int, default=5, help="Number of slowest imports to show"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="Fail if any command spends longer than this importing, in milliseconds",
+    )
+    args = parser.parse_args()
+
+    console = Console()
+    table = Table("Command", "Import ms", "Wall ms", "Slowest imports")
+    over_budget = []
+
+    for command in args.command or DEFAULT_COMMANDS:
+        runs = [run_command(command.split()) for _ in range(args.repeat)]
+
+        import_time = statistics.median(sum(imports.values()) for _, imports in runs)
+        wall_time = statistics.median(duration for duration, _ in runs)
+
+        # The slowest imports of the median run
+        _, imports = sorted(runs, key=lambda run: sum(run[1].values()))[len(runs) // 2]
+        slowest = sorted(imports.items(), key=lambda i: i[1], reverse=True)
+
+        table.add_row(
+            command,
+            f"{import_time * 1000:.0f}",
+            f"{wall_time * 1000:.0f}",
+            ", ".join(
+                f"{module} ({seconds * 1000:.0f})"
+                for module, seconds in slowest[: args.top]
+            ),
+        )
+
+        if args.budget is not None and import_time * 1000 > args.budget:
+            over_budget.append(command)
+
+    console.print(table)
+
+    if over_budget:
+        console.print(
+            f"Over the {args.budget:.0f}ms import budget: {', '.join(over_budget)}",
+            style="red",
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""
+A local stand-in for the parts of the Heroku API heroku-audit uses.
+
+The estate is generated deterministically from the number of apps, so runs
+are reproducible. Every host (`api.heroku.com`, `postgres-api.heroku.com`
+etc) is served from the same server, with the host as the first path segment.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
+
+import requests.adapters
+
+API_HOST = "api.heroku.com"
+TEAM_COUNT = 10
+RATE_LIMIT = 4500
+REFILL_RATE = RATE_LIMIT / 3600
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+RANGE_RE = re.compile(
+    r"^(?P<field>\w+) (?P<exclusive>\]?)(?P<start>[^.;]*)\.\.(?P<end>[^;\[]*)(?P<end_exclusive>\[?)\s*(?:;\s*(?P<options>.*))?$"
+)
+
+
+def make_id(*parts: object) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "/".join(map(str, parts))))
+
+
+def make_timestamp(offset: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_600_000_000 + offset))
+
+
+class Estate:
+    """
+    A generated Heroku estate, with `app_count` apps spread across teams
+    """
+
+    def __init__(self, app_count: int) -> None:
+        self.apps = [self._make_app(i) for i in range(app_count)]
+        self.apps_by_name = {app["name"]: app for app in self.apps}
+        self.teams = sorted({app["team"]["name"] for app in self.apps})
+
+        self.addons: dict[str, list[dict]] = {}
+        self.addons_by_id: dict[str, dict] = {}
+        for i, app in enumerate(self.apps):
+            addons = self._make_addons(i, app)
+            self.addons[app["name"]] = addons
+            for addon in addons:
+                self.addons_by_id[addon["id"]] = addon
+
+    def _make_app(self, i: int) -> dict:
+        team = f"team-{i % TEAM_COUNT}"
+        return {
+            "id": make_id("app", i),
+            "name": f"app-{i:05d}",
+            "team": {"id": make_id("team", team), "name": team},
+            "created_at": make_timestamp(i),
+            "updated_at": make_timestamp(i * 60),
+            "released_at": make_timestamp(i * 60),
+            "web_url": f"https://app-{i:05d}.herokuapp.com/",
+        }
+
+    def _make_addons(self, i: int, app: dict) -> list[dict]:
+        plans = ["papertrail:choklad"]
+        if i % 2 == 0:
+            plans.append(
+                "heroku-postgresql:" + ("essential-0" if i % 4 else "standard-0")
+            )
+        if i % 3 == 0:
+            plans.append("heroku-redis:" + ("mini" if i % 6 else "premium-0"))
+
+        return [
+            {
+                "id": make_id("addon", i, plan),
+                "name": f"{plan.split(':')[0]}-{i:05d}",
+                "app": {"id": app["id"], "name": app["name"]},
+                "plan": {"id": make_id("plan", plan), "name": plan},
+                "config_vars": [plan.split(":")[0].upper().replace("-", "_") + "_URL"],
+                "created_at": make_timestamp(i),
+                "updated_at": make_timestamp(i),
+            }
+            for plan in plans
+        ]
+
+    def formation(self, i: int) -> list[dict]:
+        return [
+            {
+                "id": make_id("formation", i, process),
+                "type": process,
+                "size": "Basic" if i % 5 == 0 else "Standard-1X",
+                "quantity": (i + n) % 3,
+                "command": f"run-{process}",
+                "created_at": make_timestamp(i),
+                "updated_at": make_timestamp(i),
+            }
+            for n, process in enumerate(["web", "worker"])
+        ]
+
+    def config_vars(self, i: int) -> dict[str, str]:
+        config = {f"SETTING_{n}": f"value-{i}-{n}" for n in range(20)}
+        config["DJANGO_SETTINGS_MODULE"] = "app.settings.production"
+        config["SECRET_KEY"] = hashlib.sha256(f"secret-{i}".encode()).hexdigest()
+        return config
+
+    def domains(self, i: int, app: dict) -> list[dict]:
+        return [
+            {
+                "id": make_id("domain", i, hostname),
+                "hostname": hostname,
+                "cname": None
+                if hostname.endswith("herokuapp.com")
+                else f"{hostname}.herokudns.com",
+                "acm_status": None
+                if hostname.endswith("herokuapp.com")
+                else "cert issued",
+                "created_at": make_timestamp(i),
+                "updated_at": make_timestamp(i),
+            }
+            for hostname in [
+                f"{app['name']}.herokuapp.com",
+                f"{app['name']}.example.com",
+            ]
+        ]
+
+    def collaborators(self, i: int) -> list[dict]:
+        return [
+            {
+                "id": make_id("collaborator", i, n),
+                "user": {"id": make_id("user", n), "email": f"user-{n}@example.com"},
+                "role": "collaborator",
+                "created_at": make_timestamp(i),
+                "updated_at": make_timestamp(i),
+            }
+            for n in {i % 50, (i * 7) % 50, 50 + i % 3}
+        ]
+
+    def members(self, team: str) -> list[dict]:
+        team_number = int(team.rsplit("-", 1)[-1])
+        return [
+            {
+                "id": make_id("member", team, n),
+                "user": {"id": make_id("user", n), "email": f"user-{n}@example.com"},
+                "role": "admin" if n % 10 == 0 else "member",
+                "created_at": make_timestamp(n),
+                "updated_at": make_timestamp(n),
+            }
+            for n in range(team_number, 50, 3)
+        ]
+
+    def postgres_details(self, addon: dict) -> dict:
+        index = int(addon["name"].rsplit("-", 1)[-1])
+        info = [
+            {"name": "PG Version", "values": [f"{14 + index % 3}.{index % 10}"]},
+            {"name": "Plan", "values": [addon["plan"]["name"]]},
+        ]
+        if index % 4 == 0:
+            info.append(
+                {"name": "Maintenance window", "values": ["Mondays 10:00 to 14:00 UTC"]}
+            )
+        return {"addon_id": addon["id"], "info": info}
+
+    def postgres_schedules(self, addon: dict) -> list[dict]:
+        index = int(addon["name"].rsplit("-", 1)[-1])
+        if index % 8 == 0:
+            return []
+        return [{"name": "DATABASE_URL", "hour": index % 24, "timezone": "UTC"}]
+
+    def redis_details(self, addon: dict) -> dict:
+        index = int(addon["name"].rsplit("-", 1)[-1])
+        info = [
+            {"name": "Version", "values": [f"{6 + index % 2}.2.{index % 10}"]},
+            {
+                "name": "Maxmemory",
+                "values": ["noeviction" if index % 2 else "allkeys-lru"],
+            },
+        ]
+        if index % 4 == 0:
+            info.append(
+                {
+                    "name": "Maintenance window",
+                    "values": ["Tuesdays 10:00 to 14:00 UTC"],
+                }
+            )
+        return {"addon_id": addon["id"], "info": info}
+
+
+class MockHerokuServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        estate: Estate,
+        latency: float = 0.0,
+        rate_limit: Optional[int] = None,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+    ) -> None:
+        super().__init__(address, MockHerokuHandler)
+        self.estate = estate
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self._budget = float(rate_limit or RATE_LIMIT)
+        self._budget_updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def consume(self) -> Optional[int]:
+        """
+        Count a request against the budget, returning the remaining budget.
+
+        Like Heroku's, the budget refills continuously. A negative result means
+        the request should be rejected.
+        """
+        with self._lock:
+            self.request_count += 1
+            if self.rate_limit is None:
+                return RATE_LIMIT
+
+            now = time.monotonic()
+            self._budget = min(
+                float(self.rate_limit),
+                self._budget + (now - self._budget_updated_at) * REFILL_RATE,
+            )
+            self._budget_updated_at = now
+
+            if self._budget < 1:
+                self.rate_limited_count += 1
+                return -1
+
+            self._budget -= 1
+            return int(self._budget)
+
+
+class MockHerokuHandler(BaseHTTPRequestHandler):
+    server: MockHerokuServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        host, _, path = self.path.lstrip("/").partition("/")
+        path = "/" + urlsplit(path).path.strip("/")
+
+        remaining = self.server.consume()
+        if remaining is not None and remaining < 0:
+            self.send_json(
+                429, {"id": "rate_limit", "message": "Rate limit exceeded"}, remaining=0
+            )
+            return
+
+        handler = self.route(host, path)
+        if handler is None:
+            self.send_json(
+                404, {"id": "not_found", "message": path}, remaining=remaining
+            )
+            return
+
+        data = handler()
+        if isinstance(data, list) and host == API_HOST:
+            self.send_page(data, remaining)
+        else:
+            self.send_json(200, data, remaining=remaining)
+
+    def route(self, host: str, path: str) -> Optional[Callable[[], Any]]:
+        estate = self.server.estate
+        parts = path.strip("/").split("/")
+
+        if host in {"postgres-api.heroku.com", "postgres-starter-api.heroku.com"}:
+            if parts[:3] == ["client", "v11", "databases"] and len(parts) >= 4:
+                addon = estate.addons_by_id.get(parts[3])
+                if addon is None:
+                    return None
+                if parts[4:] == ["transfer-schedules"]:
+                    return partial(estate.postgres_schedules, addon)
+                if len(parts) == 4:
+                    return partial(estate.postgres_details, addon)
+            return None
+
+        if host == "redis-api.heroku.com":
+            if parts[:3] == ["redis", "v0", "databases"] and len(parts) == 4:
+                addon = estate.addons_by_id.get(parts[3])
+                if addon is not None:
+                    return partial(estate.redis_details, addon)
+            return None
+
+        if host != API_HOST:
+            return None
+
+        if parts == ["account", "rate-limits"]:
+            return lambda: {"remaining": RATE_LIMIT}
+        if parts == ["apps"]:
+            return lambda: estate.apps
+        if parts == ["addons"]:
+            return lambda: list(estate.addons_by_id.values())
+
+        if parts[0] == "teams" and len(parts) == 3 and parts[1] in estate.teams:
+            team = parts[1]
+            if parts[2] == "apps":
+                return lambda: [a for a in estate.apps if a["team"]["name"] == team]
+            if parts[2] == "members":
+                return lambda: estate.members(team)
+            if parts[2] == "addons":
+                return lambda: [
+                    addon
+                    for a in estate.apps
+                    if a["team"]["name"] == team
+                    for addon in estate.addons[a["name"]]
+                ]
+            return None
+
+        if parts[0] == "apps" and len(parts) >= 2 and parts[1] in estate.apps_by_name:
+            app = estate.apps_by_name[parts[1]]
+            i = int(app["name"].rsplit("-", 1)[-1])
+            resources: dict[tuple[str, ...], Callable[[], Any]] = {
+                (): lambda: app,
+                ("addons",): lambda: estate.addons[app["name"]],
+                ("formation",): lambda: estate.formation(i),
+                ("config-vars",): lambda: estate.config_vars(i),
+                ("domains",): lambda: estate.domains(i, app),
+                ("collaborators",): lambda: estate.collaborators(i),
+            }
+            return resources.get(tuple(parts[2:]))
+
+        return None
+
+    def send_page(self, items: list[dict], remaining: Optional[int]) -> None:
+        """
+        Paginate a collection the way Heroku does, using `Range` and `Next-Range`
+        """
+        match = RANGE_RE.match(self.headers.get("Range", "").strip())
+        field = "id"
+        page_size = DEFAULT_PAGE_SIZE
+        if match:
+            field = match["field"]
+            options = dict(
+                option.strip().split("=", 1)
+                for option in (match["options"] or "").replace(";", ",").split(",")
+                if "=" in option
+            )
+            page_size = min(int(options.get("max", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+
+        def sort_key(item: dict) -> str:
+            return str(item.get(field, item.get("id", "")))
+
+        items = sorted(items, key=sort_key)
+
+        if match:
+            start, end = match["start"], match["end"]
+            items = [
+                item
+                for item in items
+                if (
+                    not start
+                    or (
+                        sort_key(item) > start
+                        if match["exclusive"]
+                        else sort_key(item) >= start
+                    )
+                )
+                and (
+                    not end
+                    or (
+                        sort_key(item) < end
+                        if match["end_exclusive"]
+                        else sort_key(item) <= end
+                    )
+                )
+            ]
+
+        page = items[:page_size]
+        headers = {}
+        status = 200
+        if len(items) > page_size:
+            status = 206
+            end_suffix = ""
+            if match and match["end"]:
+                end_suffix = match["end"] + match["end_exclusive"]
+            headers["Next-Range"] = (
+                f"{field} ]{sort_key(page[-1])}..{end_suffix}; max={page_size}"
+            )
+
+        self.send_json(status, page, remaining=remaining, headers=headers)
+
+    def send_json(
+        self,
+        status: int,
+        data: Any,
+        remaining: Optional[int] = None,
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        body = json.dumps(data).encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'  # noqa: S324
+
+        if status in {200, 206} and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        if remaining is not None:
+            self.send_header("RateLimit-Remaining", str(remaining))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@contextmanager
+def redirect_to(server_url: str) -> Iterator[None]:
+    """
+    Send all `requests` traffic to the mock server, whichever host it was for
+    """
+    original_send = requests.adapters.HTTPAdapter.send
+
+    def send(
+        self: requests.adapters.HTTPAdapter,
+        request: requests.PreparedRequest,
+        *args: Any,
+        **kwargs: Any,
+    ) -> requests.Response:
+        url = urlsplit(str(request.url))
+        if url.hostname and url.hostname.endswith("heroku.com"):
+            request.url = f"{server_url}/{url.hostname}{url.path}" + (
+                f"?{url.query}" if url.query else ""
+            )
+        return original_send(self, request, *args, **kwargs)
+
+    requests.adapters.HTTPAdapter.send = send  # type:ignore[method-assign]
+    try:
+        yield
+    finally:
+        requests.adapters.HTTPAdapter.send = original_send  # type:ignore[method-assign]
+
+
+@contextmanager
+def run_server(
+    app_count: int, latency: float = 0.0, rate_limit: Optional[int] = None
+) -> Iterator[MockHerokuServer]:
+    server = MockHerokuServer(Estate(app_count), latency=latency, rate_limit=rate_limit)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--apps", type=int, default=100)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds of latency per request"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=None,
+        help="Requests allowed before returning 429s",
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    server = MockHerokuServer(
+        Estate(args.apps),
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        address=("127.0.0.1", args.port),
+    )
+    print(f"Serving {args.apps} apps on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
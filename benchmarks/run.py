@@ -0,0 +1,168 @@
+"""
+Time every heroku-audit report against a mock Heroku API, at a range of estate
+sizes.
+
+Each command runs in a fresh process (so startup time is included), against a
+server generating the given number of apps. Results are printed as a table,
+and can be saved as JSON to compare against a baseline.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --apps 100 --latency 0.05 --command postgres
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mock_heroku import run_server
+from rich.console import Console
+from rich.table import Table
+
+CLI = Path(__file__).resolve().parent / "cli.py"
+
+DEFAULT_APP_COUNTS = [10, 100, 1000, 5000]
+
+COMMANDS = [
+    ["apps", "formation"],
+    ["apps", "addon", "heroku-postgresql"],
+    ["apps", "access", "app-00000"],
+    ["apps", "domains", "app-00000"],
+    ["env", "value-of", "SETTING_1"],
+    ["env", "contains", "value-1-*"],
+    ["postgres", "major-version"],
+    ["postgres", "plan"],
+    ["postgres", "count"],
+    ["postgres", "backup-schedule"],
+    ["postgres", "maintenance-window"],
+    ["redis", "major-version"],
+    ["redis", "plan"],
+    ["redis", "count"],
+    ["redis", "maxmemory-policy"],
+    ["redis", "maintenance-window"],
+    ["users", "access", "user-1@example.com"],
+    ["users", "teams", "user-1@example.com"],
+    ["users", "matrix"],
+    ["domains", "matches", "*.example.com"],
+]
+
+
+def run_command(server_url: str, args: list[str], home: str) -> float:
+    env = {
+        **os.environ,
+        "HOME": home,
+        "XDG_CONFIG_HOME": home,
+        "HEROKU_API_KEY": "benchmark",
+    }
+    for name in ["HEROKU_AUDIT_CACHE", "HEROKU_AUDIT_SYNC"]:
+        env.pop(name, None)
+
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(CLI), server_url, *args, "--format", "csv"],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--apps",
+        type=int,
+        action="append",
+        help=f"Number of apps in the estate (default {DEFAULT_APP_COUNTS})",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds of latency per request"
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, default=None, help="Rate limit budget of the server"
+    )
+    parser.add_argument(
+        "--command",
+        action="append",
+        help="Only run commands starting with this (eg 'postgres')",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Runs per command, taking the median"
+    )
+    parser.add_argument("--output", type=Path, help="Save the results as JSON")
+    args = parser.parse_args()
+
+    commands = [
+        command
+        for command in COMMANDS
+        if not args.command
+        or any(" ".join(command).startswith(c) for c in args.command)
+    ]
+
+    console = Console()
+    table = Table("Command", "Apps", "Seconds", "Requests", "Requests/s", "429s")
+    results = []
+
+    with tempfile.TemporaryDirectory() as home:
+        for app_count in args.apps or DEFAULT_APP_COUNTS:
+            with run_server(app_count, args.latency, args.rate_limit) as server:
+                for command in commands:
+                    name = " ".join(command)
+                    durations = []
+                    requests_before = server.request_count
+                    rate_limited_before = server.rate_limited_count
+
+                    for _ in range(args.repeat):
+                        durations.append(run_command(server.url, command, home))
+
+                    duration = statistics.median(durations)
+                    request_count = (
+                        server.request_count - requests_before
+                    ) // args.repeat
+                    rate_limited = (
+                        server.rate_limited_count - rate_limited_before
+                    ) // args.repeat
+
+                    results.append(
+                        {
+                            "command": name,
+                            "apps": app_count,
+                            "seconds": round(duration, 3),
+                            "requests": request_count,
+                            "rate_limited": rate_limited,
+                        }
+                    )
+                    table.add_row(
+                        name,
+                        str(app_count),
+                        f"{duration:.2f}",
+                        str(request_count),
+                        f"{request_count / duration:.0f}",
+                        str(rate_limited),
+                    )
+                    console.print(f"{name} ({app_count} apps): {duration:.2f}s")
+
+    console.print(table)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "latency": args.latency,
+                    "rate_limit": args.rate_limit,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,18 @@
-from heroku_audit.cli import app
+import sys
 
-app()
+from heroku_audit import __version__
+
+
+def main() -> None:
+    # Version checks are answered without importing the CLI, which is slower
+    if sys.argv[1:] in (["--version"], ["-v"]):
+        print(f"Heroku Audit v{__version__}")
+        return
+
+    from heroku_audit.cli import app
+
+    app()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+from typing import Optional, TypedDict, cast
+
+from heroku3.models.addon import Addon
+
+from heroku_audit.client import heroku
+
+HEROKU_POSTGRES = "heroku-postgresql:"
+
+
+def get_postgres_api_hostname(addon: Addon) -> str:
+    if any(x in addon.plan.name for x in ["dev", "basic", "mini"]):
+        return "postgres-starter-api.heroku.com"
+    return "postgres-api.heroku.com"
+
+
+class HerokuPostgresDetails(TypedDict):
+    postgres_version: str
+    maintenance_window: Optional[str]
+
+
+class HerokuBackupSchedule(TypedDict):
+    hour: str
+    timezone: str
+
+
+def get_heroku_postgres_details(addon: Addon) -> HerokuPostgresDetails:
+    host = get_postgres_api_hostname(addon)
+    response = heroku._session.get(f"https://{host}/client/v11/databases/{addon.id}")
+    response.raise_for_status()
+    data = response.json()
+
+    # Reshape for easier parsing
+    data["info"] = {i["name"]: i["values"] for i in data["info"]}
+
+    return {
+        "postgres_version": data["info"]["PG Version"][0],
+        "maintenance_window": data["info"].get("Maintenance window", [None])[0],
+    }
+
+
+def get_heroku_postgres_backup_schedules(addon: Addon) -> list[HerokuBackupSchedule]:
+    host = get_postgres_api_hostname(addon)
+    response = heroku._session.get(
+        f"https://{host}/client/v11/databases/{addon.id}/transfer-schedules"
+    )
+    response.raise_for_status()
+    return cast(list[HerokuBackupSchedule], response.json())
+
+
+HEROKU_REDIS = "heroku-redis:"
+
+
+class HerokuRedisDetails(TypedDict):
+    version: str
+    maxmemory_policy: str
+    maintenance_window: Optional[str]
+
+
+def get_heroku_redis_details(addon: Addon) -> dict:
+    response = heroku._session.get(
+        f"https://redis-api.heroku.com/redis/v0/databases/{addon.id}"
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    # Reshape for easier parsing
+    data["info"] = {i["name"]: i["values"] for i in data["info"]}
+
+    return {
+        "version": data["info"]["Version"][0],
+        "maxmemory_policy": data["info"]["Maxmemory"][0],
+        "maintenance_window": data["info"].get("Maintenance window", [None])[0],
+    }
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from heroku_audit.config import APP_DIR
+
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
+
+CACHE_DIR = APP_DIR / "cache"
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+DEFAULT_TTL = 10 * 60
+
+# Matched against the URL path, first match wins
+RESOURCE_TTLS = [
+    (re.compile(r"/config-vars$"), 5 * 60),
+    (re.compile(r"/formation$"), 15 * 60),
+    (re.compile(r"/(collaborators|members)$"), 15 * 60),
+    (re.compile(r"/(addons|domains)$"), 60 * 60),
+    (re.compile(r"^/client/v11/databases/"), 60 * 60),
+    (re.compile(r"^/redis/v0/databases/"), 60 * 60),
+]
+
+CACHEABLE_STATUSES = {200, 206}
+
+# When syncing, resources of unchanged apps are still refetched this often, to
+# pick up changes which don't touch the app itself (eg a new collaborator)
+SYNC_MAX_AGE = 24 * 60 * 60
+
+# Responses containing secrets, which are encrypted before being cached
+SECRET_RESOURCE_RE = re.compile(r"/config-vars$")
+
+APP_LISTING_RE = re.compile(r"^/(teams/[^/]+/)?apps$")
+ADDON_LISTING_RE = re.compile(r"^/(teams/[^/]+/)?addons$")
+APP_RESOURCE_RE = re.compile(r"^/apps/(?P<app>[^/]+)/")
+
+
+def get_ttl(url: str) -> int:
+    path = urlsplit(url).path
+    return next(
+        (ttl for pattern, ttl in RESOURCE_TTLS if pattern.search(path)),
+        DEFAULT_TTL,
+    )
+
+
+def get_cache_key(api_key: str, url: str, headers: Mapping[str, Any]) -> str:
+    """
+    Identify a response by who requested it, and which page of which resource.
+    """
+    key = hashlib.sha256()
+    for part in (api_key, url, headers.get("Accept", ""), headers.get("Range", "")):
+        key.update(str(part).encode())
+        key.update(b"\0")
+    return key.hexdigest()
+
+
+def get_app_version(app: Mapping[str, Any]) -> str:
+    """
+    A value which changes whenever an app is updated or released.
+    """
+    return f"{app.get('updated_at')} {app.get('released_at')}"
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    stored_at: float
+
+    # The version of the app this resource belongs to, when it was fetched
+    app_version: Optional[str] = None
+
+    @classmethod
+    def from_response(
+        cls, response: requests.Response, app_version: Optional[str] = None
+    ) -> "CachedResponse":
+        return cls(
+            response.status_code,
+            dict(response.headers),
+            response.content,
+            time.time(),
+            app_version,
+        )
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    @property
+    def etag(self) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get("ETag")
+
+    def to_response(self, url: str) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.url = url
+        response.encoding = "utf-8"
+        return response
+
+
+class ResponseCache:
+    """
+    A size-bounded, least-recently-used store of API responses.
+
+    The cache is only readable by its owner, and config vars are encrypted using
+    the API key which fetched them, like the config var index.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        cache_dir: Path = CACHE_DIR,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        cache_dir.chmod(0o700)
+
+        # SQLite creates its WAL and shared memory files with the database's
+        # permissions, so only the database needs creating privately
+        db_path = cache_dir / "responses.sqlite3"
+        os.close(os.open(db_path, os.O_RDWR | os.O_CREAT, 0o600))
+        for path in [db_path, *cache_dir.glob(f"{db_path.name}-*")]:
+            path.chmod(0o600)
+
+        self._api_key = api_key
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            db_path,
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                app_version TEXT,
+                encrypted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+        if "app_version" not in columns:
+            self._db.execute("ALTER TABLE responses ADD COLUMN app_version TEXT")
+        if "encrypted" not in columns:
+            # Older caches stored config vars in plaintext
+            self._db.execute("DELETE FROM responses")
+            self._db.execute(
+                "ALTER TABLE responses ADD COLUMN encrypted INTEGER NOT NULL DEFAULT 0"
+            )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self._size: int = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses"
+        ).fetchone()[0]
+
+    @cached_property
+    def _fernet(self) -> "Fernet":
+        # Only needed for config vars, so not imported up front
+        from heroku_audit.index import SALT_SIZE, get_fernet
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('salt', ?)",
+                (os.urandom(SALT_SIZE),),
+            )
+            salt = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'salt'"
+            ).fetchone()[0]
+
+        return get_fernet(self._api_key, salt)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, stored_at, app_version, encrypted FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+
+        status, headers, body, stored_at, app_version, encrypted = row
+
+        if encrypted:
+            from cryptography.fernet import InvalidToken
+
+            try:
+                body = self._fernet.decrypt(body)
+            except InvalidToken:
+                return None
+
+        return CachedResponse(status, json.loads(headers), body, stored_at, app_version)
+
+    def set(
+        self, key: str, response: requests.Response, app_version: Optional[str] = None
+    ) -> None:
+        cached = CachedResponse.from_response(response, app_version)
+
+        body = cached.body
+        encrypted = bool(SECRET_RESOURCE_RE.search(urlsplit(response.url).path))
+        if encrypted:
+            body = self._fernet.encrypt(body)
+
+        with self._lock:
+            previous = self._db.execute(
+                "SELECT LENGTH(body) FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    cached.status,
+                    json.dumps(cached.headers),
+                    body,
+                    cached.stored_at,
+                    cached.stored_at,
+                    cached.app_version,
+                    encrypted,
+                ),
+            )
+            self._size += len(body) - (previous[0] if previous else 0)
+            self._evict()
+
+    def refresh(self, key: str, app_version: Optional[str] = None) -> None:
+        """
+        Mark a response as fresh, after the API confirmed it hasn't changed.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ?, app_version = ? WHERE key = ?",
+                (now, now, app_version, key),
+            )
+
+    def _evict(self) -> None:
+        while self._size > self._max_size:
+            oldest = self._db.execute(
+                "SELECT key, LENGTH(body) FROM responses ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not oldest:
+                break
+
+            for key, size in oldest:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self._max_size:
+                    break
@@ -1,25 +1,73 @@
-from typing import Annotated, Optional, cast
+import importlib
+import json
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Annotated, Any, Optional
 
+import click
 import typer
 from rich.console import Console
+from rich.table import Column, Table
+from typer.core import TyperGroup
 from typer.rich_utils import _print_commands_panel
 
 from heroku_audit import __version__
-from heroku_audit.config import APP_DIR, load_env_config
-
-from . import apps, domains, env, postgres, redis, users
+from heroku_audit.config import APP_DIR, load_env_config, settings
 
 load_env_config()
 
-app = typer.Typer(help="Heroku audit tool")
+# Commands, and the object defining them. Their modules (and the libraries they
+# need) are only imported once the command is used, so startup stays fast.
+LAZY_COMMANDS = {
+    "batch": "heroku_audit.cli.batch:batch",
+    "diff": "heroku_audit.cli.snapshot:diff",
+    "apps": "heroku_audit.cli.apps:app",
+    "env": "heroku_audit.cli.env:app",
+    "postgres": "heroku_audit.cli.postgres:app",
+    "redis": "heroku_audit.cli.redis:app",
+    "users": "heroku_audit.cli.users:app",
+    "domains": "heroku_audit.cli.domains:app",
+    "snapshot": "heroku_audit.cli.snapshot:app",
+}
+
+
+def load_command(name: str, import_path: str) -> click.Command:
+    module_name, attr_name = import_path.split(":")
+    obj = getattr(importlib.import_module(module_name), attr_name)
+
+    if isinstance(obj, typer.Typer):
+        return typer.main.get_group(obj)
+
+    command_app = typer.Typer(add_completion=False)
+    command_app.command(name=name)(obj)
+    return typer.main.get_command(command_app)
 
 
-app.add_typer(apps.app)
-app.add_typer(env.app)
-app.add_typer(postgres.app)
-app.add_typer(redis.app)
-app.add_typer(users.app)
-app.add_typer(domains.app)
+class LazyTyperGroup(TyperGroup):
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return [*super().list_commands(ctx), *LAZY_COMMANDS]
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.commands and cmd_name in LAZY_COMMANDS:
+            self.commands[cmd_name] = load_command(cmd_name, LAZY_COMMANDS[cmd_name])
+        return super().get_command(ctx, cmd_name)
+
+    def invoke(self, ctx: click.Context) -> Any:
+        # Click consumes the command's arguments before running the callback
+        settings.command_args = [*ctx.protected_args, *ctx.args]
+        try:
+            return super().invoke(ctx)
+        except Exception as e:
+            # Only raised once a snapshot is loaded, so it's not imported up front
+            snapshot = sys.modules.get("heroku_audit.snapshot")
+            if snapshot is None or not isinstance(e, snapshot.SnapshotMissingError):
+                raise
+            Console(stderr=True).print(str(e), style="red")
+            raise typer.Exit(1) from e
+
+
+app = typer.Typer(help="Heroku audit tool", cls=LazyTyperGroup)
 
 
 def version_callback(version: bool) -> None:
@@ -34,14 +82,22 @@ def show_config_dir_callback(should_show_config_dir: bool) -> None:
         raise typer.Exit()
 
 
-def list_callback(should_list: bool) -> None:
+def list_callback(ctx: typer.Context, should_list: bool) -> None:
     if should_list:
-        typer_group = typer.main.get_group(app)
+        root = ctx.command
+        assert isinstance(root, click.Group)
 
         commands = []
-        for group_name, group in sorted(typer_group.commands.items()):
-            command_group = cast(typer.core.TyperGroup, group)
-            for _command_name, command in sorted(command_group.commands.items()):
+        for group_name in sorted(root.list_commands(ctx)):
+            group = root.get_command(ctx, group_name)
+            if not isinstance(group, click.Group):
+                if group is not None:
+                    commands.append(group)
+                continue
+            for command_name in sorted(group.list_commands(ctx)):
+                command = group.get_command(ctx, command_name)
+                if command is None:
+                    continue
                 # Prefix command name
                 command.name = f"{group_name} {command.name}"
                 commands.append(command)
@@ -57,8 +113,160 @@ def list_callback(should_list: bool) -> None:
         raise typer.Exit()
 
 
-@app.callback()
+def rate_limit_report_callback() -> None:
+    from heroku_audit.ratelimit import governor
+    from heroku_audit.utils import SHOW_PROGRESS
+
+    summary = governor.get_summary()
+    if summary and SHOW_PROGRESS:
+        Console(stderr=True).print(summary, style="dim")
+
+
+def profile_report_callback(profile: bool, profile_output: Optional[Path]) -> None:
+    from heroku_audit.metrics import profiler
+
+    report = profiler.to_dict()
+
+    if profile_output is not None:
+        profile_output.write_text(json.dumps(report, indent=2))
+
+    if not profile:
+        return
+
+    endpoints = Table(
+        Column("Endpoint", overflow="fold"), title="Requests (latency in ms)"
+    )
+    for heading in ["Sent", "Cached", "Errors", "Retries", "p50", "p95", "p99", "KB"]:
+        endpoints.add_column(heading, justify="right", no_wrap=True)
+    for endpoint, stats in sorted(
+        report["endpoints"].items(), key=lambda e: e[1]["requests"], reverse=True
+    ):
+        endpoints.add_row(
+            endpoint,
+            str(stats["requests"]),
+            str(stats["cached"]),
+            str(stats["errors"]),
+            str(stats["retries"]),
+            str(stats["p50_ms"]),
+            str(stats["p95_ms"]),
+            str(stats["p99_ms"]),
+            str(round(stats["bytes"] / 1024)),
+        )
+
+    stages = Table("Stage", "Calls", "Seconds", title="Stages")
+    for stage, stats in report["stages"].items():
+        stages.add_row(stage, str(stats["calls"]), str(stats["seconds"]))
+
+    console = Console(stderr=True)
+    console.print(endpoints)
+    console.print(stages)
+    request_count = sum(stats["requests"] for stats in report["endpoints"].values())
+    connection_count = sum(report["connections"].values())
+    console.print(
+        f"Peak concurrency {report['max_concurrency']} of --concurrency {settings.concurrency}, "
+        f"{report['seconds']}s in total",
+        style="dim",
+    )
+    console.print(
+        f"Opened {connection_count} connections for {request_count} requests "
+        f"({max(request_count - connection_count, 0)} reused)",
+        style="dim",
+    )
+
+
+def get_command_path(ctx: click.Context, args: list[str]) -> list[str]:
+    """
+    The names of the command being run, and the groups it's in.
+    """
+    path = []
+    command = ctx.command
+    for arg in args:
+        if not isinstance(command, click.Group):
+            break
+        subcommand = command.get_command(ctx, arg)
+        if subcommand is None:
+            break
+        path.append(arg)
+        command = subcommand
+    return path
+
+
+def get_option_names(args: list[str]) -> list[str]:
+    """
+    The options given, without their values or any arguments, which may be
+    the secrets being searched for.
+    """
+    names = set()
+    for arg in args:
+        if arg == "--":
+            break
+        if arg.startswith("--"):
+            names.add(arg.split("=", 1)[0])
+        elif arg.startswith("-"):
+            # Short options can have their value attached
+            names.add(arg[:2])
+    return sorted(names)
+
+
+def trace_export_callback(trace: Path) -> None:
+    from heroku_audit.tracing import tracer
+
+    tracer.export(trace)
+
+
+def complete_callback(*args: Any, **kwargs: Any) -> None:
+    from heroku_audit.failures import failures
+
+    if failures.count:
+        from heroku_audit.format import display_failures
+
+        # Including those from commands which don't display a report
+        display_failures()
+
+        # Keep the journal, so --resume only retries what failed
+        Console(stderr=True).print(
+            f"{failures.count} apps or addons couldn't be fetched, so are missing from the results.",
+            style="red",
+        )
+        raise typer.Exit(1)
+
+    # Without the client, no requests were made, so there's no journal
+    if "heroku_audit.client" not in sys.modules:
+        return
+
+    from heroku_audit.client import get_journal
+
+    # The command succeeded, so there's nothing left to resume
+    journal = get_journal()
+    if journal is not None:
+        journal.delete()
+
+
+def journal_report_callback() -> None:
+    # Without the client, no requests were made, so there's no journal
+    if "heroku_audit.client" not in sys.modules:
+        return
+
+    from heroku_audit.client import get_journal
+
+    journal = get_journal()
+    if journal is None or journal.closed:
+        return
+
+    if not journal.response_count:
+        journal.delete()
+        return
+
+    journal.close()
+    Console(stderr=True).print(
+        f"Rerun with --resume to continue from the {journal.response_count} responses fetched so far.",
+        style="yellow",
+    )
+
+
+@app.callback(result_callback=complete_callback)
 def main(
+    ctx: typer.Context,
     version: Annotated[
         Optional[bool],
         typer.Option(
@@ -88,5 +296,121 @@ def main(
             callback=show_config_dir_callback,
         ),
     ] = False,
+    cache: Annotated[
+        bool,
+        typer.Option(
+            "--cache/--no-cache",
+            envvar="HEROKU_AUDIT_CACHE",
+            help="Cache API responses in the config directory.",
+        ),
+    ] = False,
+    max_age: Annotated[
+        Optional[int],
+        typer.Option(
+            min=0,
+            help="Maximum age of cached responses, in seconds. Defaults to a per-resource value.",
+        ),
+    ] = None,
+    sync: Annotated[
+        bool,
+        typer.Option(
+            "--sync/--no-sync",
+            envvar="HEROKU_AUDIT_SYNC",
+            help="Only re-fetch the resources of apps which have changed since they were cached. Implies --cache.",
+        ),
+    ] = False,
+    concurrency: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            envvar="HEROKU_AUDIT_CONCURRENCY",
+            help="Maximum number of concurrent API requests.",
+        ),
+    ] = settings.concurrency,
+    stream: Annotated[
+        bool,
+        typer.Option(
+            help="Write CSV and JSON Lines rows as soon as they're found, rather than sorted at the end.",
+        ),
+    ] = False,
+    from_snapshot: Annotated[
+        Optional[Path],
+        typer.Option(
+            exists=True,
+            dir_okay=False,
+            help="Run reports against a snapshot (from `snapshot save`), rather than the Heroku API.",
+        ),
+    ] = None,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            help="Report where the run's time went: requests per endpoint, their latency, and time per stage.",
+        ),
+    ] = False,
+    profile_output: Annotated[
+        Optional[Path],
+        typer.Option(
+            dir_okay=False,
+            help="Write the --profile report to a JSON file.",
+        ),
+    ] = None,
+    keep_going: Annotated[
+        bool,
+        typer.Option(
+            envvar="HEROKU_AUDIT_KEEP_GOING",
+            help="Show apps and addons which can't be fetched as failures, rather than stopping the report. Exits with an error if any failed.",
+        ),
+    ] = False,
+    journal: Annotated[
+        bool,
+        typer.Option(
+            envvar="HEROKU_AUDIT_JOURNAL",
+            help="Save responses (encrypted) as they're fetched, so the run can be continued with --resume if it fails.",
+        ),
+    ] = False,
+    resume: Annotated[
+        bool,
+        typer.Option(
+            help="Continue an interrupted run of the same command, reusing the responses it had already fetched. Implies --journal.",
+        ),
+    ] = False,
+    trace: Annotated[
+        Optional[Path],
+        typer.Option(
+            dir_okay=False,
+            help="Write an OpenTelemetry trace of the run (OTLP JSON) to a file.",
+        ),
+    ] = None,
 ) -> None:
-    pass
+    settings.cache = cache
+    settings.max_age = max_age
+    settings.sync = sync
+    settings.concurrency = concurrency
+    settings.stream = stream
+    settings.snapshot = from_snapshot
+    settings.journal = journal
+    settings.resume = resume
+    settings.keep_going = keep_going
+
+    ctx.call_on_close(rate_limit_report_callback)
+    ctx.call_on_close(journal_report_callback)
+    if profile or profile_output is not None:
+        ctx.call_on_close(partial(profile_report_callback, profile, profile_output))
+
+    if trace is not None:
+        from heroku_audit.tracing import tracer
+
+        tracer.enabled = True
+
+        # Close callbacks run in reverse, so the command's span ends before export
+        ctx.call_on_close(partial(trace_export_callback, trace))
+        command_path = get_command_path(ctx, settings.command_args)
+        ctx.with_resource(
+            tracer.span(
+                f"heroku-audit {' '.join(command_path)}",
+                {
+                    "heroku_audit.command": command_path,
+                    "heroku_audit.options": get_option_names(sys.argv[1:]),
+                },
+            )
+        )
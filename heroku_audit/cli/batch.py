@@ -0,0 +1,133 @@
+import shlex
+import sys
+from pathlib import Path
+from typing import Annotated, Optional
+
+import click
+import rich
+import typer
+from rich.console import Console
+from rich.rule import Rule
+
+from heroku_audit.client import get_session
+from heroku_audit.crawl import TEAM_MEMBERS, crawl
+from heroku_audit.format import Format, FormatOption, display_failures
+from heroku_audit.options import TeamOption
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+# The resources each report reads, so they can all be fetched in a single pass
+REPORT_RESOURCES: dict[str, set[str]] = {
+    "apps addon": {"addons"},
+    "apps formation": {"formation"},
+    "domains matches": {"domains"},
+    "env contains": {"config-vars"},
+    "env value-of": {"config-vars"},
+    "postgres backup-schedule": {"postgres-backup-schedules"},
+    "postgres count": {"addons"},
+    "postgres maintenance-window": {"postgres-details"},
+    "postgres major-version": {"postgres-details"},
+    "postgres plan": {"addons"},
+    "redis count": {"addons"},
+    "redis maintenance-window": {"redis-details"},
+    "redis major-version": {"redis-details"},
+    "redis maxmemory-policy": {"redis-details"},
+    "redis plan": {"addons"},
+    "users access": {"collaborators", TEAM_MEMBERS},
+    "users matrix": {"collaborators", TEAM_MEMBERS},
+    "users teams": {TEAM_MEMBERS},
+}
+
+
+def get_report_command(ctx: typer.Context, report: str) -> tuple[str, click.Command]:
+    try:
+        group_name, command_name, *_args = shlex.split(report)
+    except ValueError:
+        raise typer.BadParameter(f"Invalid report '{report}'") from None
+
+    root = ctx.find_root().command
+    assert isinstance(root, click.Group)
+
+    group = root.get_command(ctx, group_name)
+    command = (
+        group.get_command(ctx, command_name) if isinstance(group, click.Group) else None
+    )
+    if command is None:
+        raise typer.BadParameter(f"Unknown report '{group_name} {command_name}'")
+
+    return f"{group_name} {command_name}", command
+
+
+def load_manifest(manifest: Path) -> list[str]:
+    with manifest.open("rb") as f:
+        reports = tomllib.load(f).get("reports", [])
+
+    if not isinstance(reports, list) or not all(isinstance(r, str) for r in reports):
+        raise typer.BadParameter(
+            "'reports' must be a list of reports", param_hint="--manifest"
+        )
+
+    return reports
+
+
+def batch(
+    ctx: typer.Context,
+    reports: Annotated[
+        Optional[list[str]],
+        typer.Argument(
+            help='Reports to run, with their arguments, eg "postgres major-version --target 13"',
+            show_default=False,
+        ),
+    ] = None,
+    manifest: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="TOML file containing a list of `reports`",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
+    team: TeamOption = None,
+    display_format: FormatOption = Format.TABLE,
+) -> None:
+    """
+    Run multiple reports, fetching the data they share only once.
+    """
+    reports = [*(reports or []), *(load_manifest(manifest) if manifest else [])]
+
+    if not reports:
+        raise typer.BadParameter("No reports given")
+
+    commands = [(report, *get_report_command(ctx, report)) for report in reports]
+
+    get_session().enable_memo()
+
+    crawl(
+        set().union(*(REPORT_RESOURCES.get(name, set()) for _, name, _ in commands)),
+        team,
+    )
+
+    # Reports won't show what already failed whilst crawling, with --keep-going
+    display_failures(stderr=display_format != Format.TABLE)
+
+    console = Console(stderr=display_format != Format.TABLE)
+
+    for report, name, command in commands:
+        args = shlex.split(report)[2:]
+        params = {param.name for param in command.params}
+
+        if team is not None and "team" in params and "--team" not in args:
+            args += ["--team", team]
+        if "display_format" in params and "--format" not in args:
+            args += ["--format", display_format.value]
+
+        console.print(Rule(name))
+
+        with command.make_context(name, args, parent=ctx) as command_ctx:
+            command.invoke(command_ctx)
+
+        if display_format == Format.TABLE:
+            rich.print()
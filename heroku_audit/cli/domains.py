@@ -1,54 +1,200 @@
-import fnmatch
 import operator
-from concurrent.futures import ThreadPoolExecutor
-from typing import Annotated
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Annotated, Optional
 
+import rich
 import typer
+from rich.console import Console
 from rich.progress import track
+from rich.text import Text
 
-from heroku_audit.client import heroku
+from heroku_audit.cache import SYNC_MAX_AGE, get_app_version
 from heroku_audit.format import Format, FormatOption, display_data
+from heroku_audit.index import (
+    AppDomains,
+    DomainIndex,
+    DomainIndexError,
+    DomainMatch,
+)
+from heroku_audit.matching import PatternMatcher
 from heroku_audit.options import TeamOption
-from heroku_audit.utils import SHOW_PROGRESS, get_apps_for_teams
+from heroku_audit.utils import SHOW_PROGRESS, get_apps, read_list_file, zip_map
 
 app = typer.Typer(name="domains", help="Report on domains.")
 
 
 @app.command()
 def matches(
-    pattern: Annotated[str, typer.Argument(help="Domain glob to search for")],
+    pattern: Annotated[
+        Optional[list[str]],
+        typer.Argument(help="Domain globs to search for", show_default=False),
+    ] = None,
+    patterns_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="File of domain globs to search for, one per line",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
     team: TeamOption = None,
     display_format: FormatOption = Format.TABLE,
 ) -> None:
     """
-    Find the value of a given environment variable
+    Find apps using domains matching the given patterns
     """
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
+    patterns = list(pattern or [])
+    if patterns_file is not None:
+        patterns.extend(read_list_file(patterns_file))
+
+    if not patterns:
+        raise typer.BadParameter("Provide a pattern, or --patterns-file")
 
-        domain_matches = []
+    # Hostnames are case-insensitive
+    matcher = PatternMatcher(patterns, ignore_case=True)
+    apps = get_apps(team)
 
-        for domains in track(
-            executor.map(lambda a: a.domains(), apps),
+    def get_rows() -> Iterator[dict]:
+        for _app, domains in track(
+            zip_map(lambda a: a.domains(), apps),
             description="Loading domains...",
             total=len(apps),
             disable=not SHOW_PROGRESS,
         ):
             for domain in domains:
-                if fnmatch.fnmatch(domain.hostname, pattern):
-                    domain_matches.append(domain)
+                matched = matcher.match(domain.hostname)
+                if not matched:
+                    continue
 
-    display_data(
-        sorted(
-            (
-                {
+                row = {
                     "App": domain.app.name,
                     "Domain": domain.hostname,
                     "CNAME": domain.cname,
                 }
-                for domain in domain_matches
-            ),
-            key=operator.itemgetter("App"),
+                if len(patterns) > 1:
+                    row["Patterns"] = ", ".join(sorted(matched))
+                yield row
+
+    display_data(get_rows(), display_format, sort_key=operator.itemgetter("App"))
+
+
+@app.command()
+def index(
+    team: TeamOption = None,
+    full: Annotated[
+        bool,
+        typer.Option(help="Re-fetch every app's domains, not just updated apps"),
+    ] = False,
+) -> None:
+    """
+    Save every app's domains to a local index, for `domains who-owns`
+    """
+    try:
+        previous = DomainIndex.load().apps
+    except DomainIndexError:
+        previous = {}
+
+    apps = get_apps(team)
+
+    # Apps from other teams are kept as they were
+    domain_apps: dict[str, AppDomains] = {
+        app_name: app_domains
+        for app_name, app_domains in previous.items()
+        if team is not None and app_domains["team"] != team
+    }
+
+    # Adding a domain doesn't update the app, so domains are still re-fetched
+    # once they're old enough
+    now = time.time()
+    stale_apps = []
+    for app in apps:
+        previous_domains = previous.get(app.name)
+        if (
+            not full
+            and previous_domains is not None
+            and previous_domains["version"] == get_app_version(vars(app))
+            and now - previous_domains.get("indexed_at", 0) < SYNC_MAX_AGE
+        ):
+            domain_apps[app.name] = previous_domains
+        else:
+            stale_apps.append(app)
+
+    for app, domains in track(
+        zip_map(lambda a: a.domains(), stale_apps),
+        description="Loading domains...",
+        total=len(stale_apps),
+        disable=not SHOW_PROGRESS,
+    ):
+        domain_apps[app.name] = {
+            "team": app.team.name if app.team is not None else None,
+            "version": get_app_version(vars(app)),
+            "indexed_at": now,
+            "domains": [
+                {
+                    "hostname": domain.hostname,
+                    "cname": domain.cname,
+                    "acm_status": domain.acm_status,
+                }
+                for domain in domains
+            ],
+        }
+
+    DomainIndex(domain_apps).save()
+
+    domain_count = sum(len(a["domains"]) for a in domain_apps.values())
+    rich.print(
+        f"Indexed {domain_count} domains from {len(domain_apps)} apps ({len(stale_apps)} updated)"
+    )
+
+
+@app.command()
+def who_owns(
+    hostnames: Annotated[
+        list[str],
+        typer.Argument(
+            help="Hostnames to look up, or `*.example.com` for every domain under example.com"
+        ),
+    ],
+    display_format: FormatOption = Format.TABLE,
+) -> None:
+    """
+    Find which apps own the given hostnames, using the domain index
+    """
+    try:
+        domain_index = DomainIndex.load()
+    except DomainIndexError as e:
+        rich.print(Text(str(e), style="red"))
+        raise typer.Exit(1) from e
+
+    if SHOW_PROGRESS:
+        Console(stderr=True).print(
+            f"Using domain index from {domain_index.created_at}", style="dim"
+        )
+
+    def find(hostname: str) -> Iterator[DomainMatch]:
+        if hostname.startswith("*."):
+            parent = hostname[2:].lower()
+            for match in domain_index.trie.under(parent):
+                if match.domain["hostname"].lower() != parent:
+                    yield match
+        else:
+            yield from domain_index.trie.who_owns(hostname)
+
+    display_data(
+        (
+            {
+                "Query": hostname,
+                "Domain": match.domain["hostname"],
+                "App": match.app_name,
+                "Team": domain_index.apps[match.app_name]["team"] or "",
+                "CNAME": match.domain["cname"] or "",
+                "ACM Status": match.domain["acm_status"] or "",
+            }
+            for hostname in hostnames
+            for match in find(hostname)
         ),
         display_format,
+        sort_key=operator.itemgetter("Query", "Domain", "App"),
     )
@@ -1,21 +1,79 @@
-import fnmatch
 import operator
-import re
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterator
+from itertools import chain
+from pathlib import Path
 from typing import Annotated, Optional
 
+import rich
 import typer
 from rich.progress import track
 from rich.text import Text
 
-from heroku_audit.client import heroku
+from heroku_audit.client import get_api_key
 from heroku_audit.format import Format, FormatOption, display_data
+from heroku_audit.index import EnvIndex, EnvIndexError
+from heroku_audit.matching import PatternMatcher
 from heroku_audit.options import TeamOption
-from heroku_audit.utils import SHOW_PROGRESS, get_apps_for_teams, zip_map
+from heroku_audit.utils import SHOW_PROGRESS, get_apps, read_list_file, zip_map
 
 app = typer.Typer(name="env", help="Report on Environment variables.")
 
+FromIndexOption = Annotated[
+    bool,
+    typer.Option(
+        help="Answer from the local index (see `env index`), rather than the API."
+    ),
+]
+
+
+def load_index() -> EnvIndex:
+    try:
+        return EnvIndex.load(get_api_key())
+    except EnvIndexError as e:
+        rich.print(Text(str(e), style="red"))
+        raise typer.Exit(1) from e
+
+
+@app.command()
+def index(team: TeamOption = None) -> None:
+    """
+    Save every app's environment variables to an encrypted local index
+    """
+    api_key = get_api_key()
+
+    try:
+        previous = EnvIndex.load(api_key).apps
+    except EnvIndexError:
+        previous = {}
+
+    apps = get_apps(team)
+
+    # Apps from other teams are kept as they were
+    env_apps = {
+        app_name: app_config
+        for app_name, app_config in previous.items()
+        if team is not None and app_config["team"] != team
+    }
+
+    for app, config_vars in track(
+        zip_map(lambda a: a.config(), apps),
+        description="Loading config...",
+        total=len(apps),
+        disable=not SHOW_PROGRESS,
+    ):
+        env_apps[app.name] = {
+            "team": app.team.name if app.team is not None else None,
+            "config": config_vars.to_dict(),
+        }
+
+    env_index = EnvIndex(env_apps)
+    env_index.save(api_key)
+
+    rich.print(
+        f"Indexed {len(env_index.keys)} variables from {len(env_index.apps)} apps"
+    )
+
 
 @app.command()
 def value_of(
@@ -25,79 +83,128 @@ def value_of(
         typer.Option(help="Only show apps with the variable missing"),
     ] = None,
     team: TeamOption = None,
+    from_index: FromIndexOption = False,
     display_format: FormatOption = Format.TABLE,
 ) -> None:
     """
     Find the value of a given environment variable
     """
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
-
-        app_values = {}
 
+    def get_config() -> Iterator[tuple[str, dict[str, str]]]:
+        if from_index:
+            env_index = load_index()
+            app_names = (
+                env_index.keys.get(key, [])
+                if unset is False
+                else env_index.get_app_names(team)
+            )
+            for app_name in app_names:
+                app_config = env_index.apps[app_name]
+                if team is None or app_config["team"] == team:
+                    yield app_name, app_config["config"]
+            return
+
+        apps = get_apps(team)
         for app, config_vars in track(
-            zip_map(executor, lambda a: a.config(), apps),
+            zip_map(lambda a: a.config(), apps),
             description="Loading config...",
             total=len(apps),
             disable=not SHOW_PROGRESS,
         ):
-            value = config_vars.to_dict().get(key)
+            yield app.name, config_vars.to_dict()
+
+    def get_rows() -> Iterator[dict]:
+        for app_name, config in get_config():
+            value = config.get(key)
 
             if unset and value is not None:
                 continue
             elif unset is False and value is None:
                 continue
 
-            app_values[app] = value if value is not None else Text("UNSET", style="red")
+            yield {
+                "App": app_name,
+                "Value": value if value is not None else Text("UNSET", style="red"),
+            }
 
-    display_data(
-        sorted(
-            ({"App": app.name, "Value": value} for app, value in app_values.items()),
-            key=operator.itemgetter("App"),
-        ),
-        display_format,
-    )
+    display_data(get_rows(), display_format, sort_key=operator.itemgetter("App"))
 
 
 @app.command()
 def contains(
     target: Annotated[
-        str, typer.Argument(help="Value to search for. Glob syntax is supported.")
-    ],
+        Optional[str],
+        typer.Argument(
+            help="Value to search for. Glob syntax is supported.", show_default=False
+        ),
+    ] = None,
+    patterns_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="File of values to search for, one per line",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
     team: TeamOption = None,
+    from_index: FromIndexOption = False,
     display_format: FormatOption = Format.TABLE,
 ) -> None:
     """
     Find applications with a given environment variable value set.
     """
+    patterns = [target] if target else []
+    if patterns_file is not None:
+        patterns.extend(read_list_file(patterns_file))
 
-    target_matcher = re.compile(fnmatch.translate(target))
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
+    if not patterns:
+        raise typer.BadParameter("Provide a value, or --patterns-file")
 
-        matches = defaultdict(list)
+    # Matched variables, and the patterns they matched, for each app
+    def get_matches() -> Iterator[tuple[str, dict[str, list[str]]]]:
+        if from_index:
+            matches: dict[str, dict[str, list[str]]] = defaultdict(dict)
+            for app_name, key, matched in load_index().search(patterns, team):
+                matches[app_name][key] = matched
+            yield from matches.items()
+            return
+
+        matcher = PatternMatcher(patterns)
+        apps = get_apps(team)
 
         for app, config_vars in track(
-            zip_map(executor, lambda a: a.config(), apps),
+            zip_map(lambda a: a.config(), apps),
             description="Loading config...",
             total=len(apps),
             disable=not SHOW_PROGRESS,
         ):
-            for key, val in config_vars.to_dict().items():
-                if target_matcher.match(val):
-                    matches[app].append(key)
+            yield (
+                app.name,
+                {
+                    key: matched
+                    for key, val in config_vars.to_dict().items()
+                    if (matched := matcher.match(val))
+                },
+            )
+
+    def get_rows() -> Iterator[dict]:
+        for app_name, matched_variables in get_matches():
+            if not matched_variables:
+                continue
+
+            row: dict = {
+                "App": app_name,
+                "Match Count": len(matched_variables),
+                "Matches": ", ".join(sorted(matched_variables)),
+            }
+            if len(patterns) > 1:
+                row["Patterns"] = ", ".join(
+                    sorted(set(chain.from_iterable(matched_variables.values())))
+                )
+            yield row
 
     display_data(
-        sorted(
-            (
-                {
-                    "App": app.name,
-                    "Match Count": len(matched_variables),
-                    "Matches": ", ".join(sorted(matched_variables)),
-                }
-                for app, matched_variables in matches.items()
-            ),
-            key=operator.itemgetter("Match Count", "App"),
-        ),
+        get_rows(),
         display_format,
+        sort_key=operator.itemgetter("Match Count", "App"),
     )
@@ -1,68 +1,28 @@
 import operator
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
-from typing import Annotated, Optional, TypedDict, cast
+from collections.abc import Iterator
+from typing import Annotated, Optional
 
 import typer
 from heroku3.models.addon import Addon
-from rich.progress import track
 
-from heroku_audit.client import heroku
+from heroku_audit.addons import (
+    HEROKU_POSTGRES,
+    get_heroku_postgres_backup_schedules,
+    get_heroku_postgres_details,
+)
 from heroku_audit.format import Format, FormatOption, display_data
 from heroku_audit.options import TeamOption
 from heroku_audit.style import style_backup_schedules, style_maintenance_window
 from heroku_audit.utils import (
-    SHOW_PROGRESS,
     get_addon_plan,
     get_addons,
-    get_apps_for_teams,
-    zip_map,
+    get_apps,
+    probe_addons,
 )
 
 app = typer.Typer(name="postgres", help="Report on Heroku Postgres databases.")
 
-HEROKU_POSTGRES = "heroku-postgresql:"
-
-
-def get_postgres_api_hostname(addon: Addon) -> str:
-    if any(x in addon.plan.name for x in ["dev", "basic", "mini"]):
-        return "postgres-starter-api.heroku.com"
-    return "postgres-api.heroku.com"
-
-
-class HerokuPostgresDetails(TypedDict):
-    postgres_version: str
-    maintenance_window: Optional[str]
-
-
-class HerokuBackupSchedule(TypedDict):
-    hour: str
-    timezone: str
-
-
-def get_heroku_postgres_details(addon: Addon) -> HerokuPostgresDetails:
-    host = get_postgres_api_hostname(addon)
-    response = heroku._session.get(f"https://{host}/client/v11/databases/{addon.id}")
-    response.raise_for_status()
-    data = response.json()
-
-    # Reshape for easier parsing
-    data["info"] = {i["name"]: i["values"] for i in data["info"]}
-
-    return {
-        "postgres_version": data["info"]["PG Version"][0],
-        "maintenance_window": data["info"].get("Maintenance window", [None])[0],
-    }
-
-
-def get_heroku_postgres_backup_schedules(addon: Addon) -> list[HerokuBackupSchedule]:
-    host = get_postgres_api_hostname(addon)
-    response = heroku._session.get(
-        f"https://{host}/client/v11/databases/{addon.id}/transfer-schedules"
-    )
-    response.raise_for_status()
-    return cast(list[HerokuBackupSchedule], response.json())
-
 
 @app.command()
 def major_version(
@@ -76,36 +36,24 @@ def major_version(
     """
     Audit the available postgres database versions
     """
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
-
-        postgres_addons = [
-            addon
-            for addon in get_addons(executor, apps)
-            if addon.plan.name.startswith(HEROKU_POSTGRES)
-        ]
+    apps = get_apps(team)
 
-        results = []
-        for addon, addon_details in track(
-            zip_map(executor, get_heroku_postgres_details, postgres_addons),
-            description="Probing databases...",
-            total=len(postgres_addons),
-            disable=not SHOW_PROGRESS,
+    def get_rows() -> Iterator[dict]:
+        for addon, addon_details in probe_addons(
+            apps, HEROKU_POSTGRES, get_heroku_postgres_details
         ):
             if target and addon_details["postgres_version"].split(".", 1)[0] != str(
                 target
             ):
                 continue
-            results.append(
-                {
-                    "App": addon.app.name,
-                    "Addon": addon.name,
-                    "Plan": get_addon_plan(addon),
-                    "Version": addon_details["postgres_version"],
-                }
-            )
+            yield {
+                "App": addon.app.name,
+                "Addon": addon.name,
+                "Plan": get_addon_plan(addon),
+                "Version": addon_details["postgres_version"],
+            }
 
-    display_data(sorted(results, key=operator.itemgetter("Version")), display_format)
+    display_data(get_rows(), display_format, sort_key=operator.itemgetter("Version"))
 
 
 @app.command()
@@ -123,14 +71,13 @@ def plan(
     # HACK: https://github.com/martyzz1/heroku3.py/pull/132
     Addon._strs.append("config_vars")  # type:ignore
 
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
+    apps = get_apps(team)
 
-        postgres_addons = [
-            addon
-            for addon in get_addons(executor, apps)
-            if addon.plan.name.startswith(HEROKU_POSTGRES)
-        ]
+    postgres_addons = [
+        addon
+        for addon in get_addons(apps)
+        if addon.plan.name.startswith(HEROKU_POSTGRES)
+    ]
 
     if plan:
         postgres_addons = [
@@ -138,19 +85,17 @@ def plan(
         ]
 
     display_data(
-        sorted(
-            (
-                {
-                    "App": addon.app.name,
-                    "Addon": addon.name,
-                    "Attachments": ", ".join(sorted(addon.config_vars)),
-                    "Plan": get_addon_plan(addon),
-                }
-                for addon in postgres_addons
-            ),
-            key=operator.itemgetter("App"),
+        (
+            {
+                "App": addon.app.name,
+                "Addon": addon.name,
+                "Attachments": ", ".join(sorted(addon.config_vars)),
+                "Plan": get_addon_plan(addon),
+            }
+            for addon in postgres_addons
         ),
         display_format,
+        sort_key=operator.itemgetter("App"),
     )
 
 
@@ -172,32 +117,29 @@ def count(
     # HACK: https://github.com/martyzz1/heroku3.py/pull/132
     Addon._strs.append("config_vars")  # type:ignore
 
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
+    apps = get_apps(team)
 
-        app_to_addons = defaultdict(list)
+    app_to_addons = defaultdict(list)
 
-        for addon in get_addons(executor, apps):
-            if not addon.plan.name.startswith(HEROKU_POSTGRES):
-                continue
+    for addon in get_addons(apps):
+        if not addon.plan.name.startswith(HEROKU_POSTGRES):
+            continue
 
-            app_to_addons[addon.app].append(addon)
+        app_to_addons[addon.app].append(addon)
 
     display_data(
-        sorted(
-            (
-                {
-                    "App": app.name,
-                    "Databases": len(addons),
-                    "Addon Names": ", ".join(sorted([a.name for a in addons])),
-                }
-                for app, addons in app_to_addons.items()
-                if len(addons) >= minimum
-            ),
-            key=operator.itemgetter("Databases"),
-            reverse=True,
+        (
+            {
+                "App": app.name,
+                "Databases": len(addons),
+                "Addon Names": ", ".join(sorted([a.name for a in addons])),
+            }
+            for app, addons in app_to_addons.items()
+            if len(addons) >= minimum
         ),
         display_format,
+        sort_key=operator.itemgetter("Databases"),
+        reverse=True,
     )
 
 
@@ -214,35 +156,23 @@ def backup_schedule(
     Find backup schedules for databases
     """
 
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
+    apps = get_apps(team)
 
-        postgres_addons = [
-            addon
-            for addon in get_addons(executor, apps)
-            if addon.plan.name.startswith(HEROKU_POSTGRES)
-        ]
-
-        results = []
-        for addon, backup_schedules in track(
-            zip_map(executor, get_heroku_postgres_backup_schedules, postgres_addons),
-            description="Probing databases...",
-            total=len(postgres_addons),
-            disable=not SHOW_PROGRESS,
+    def get_rows() -> Iterator[dict]:
+        for addon, backup_schedules in probe_addons(
+            apps, HEROKU_POSTGRES, get_heroku_postgres_backup_schedules
         ):
             if missing_only and backup_schedules:
                 continue
 
-            results.append(
-                {
-                    "App": addon.app.name,
-                    "Addon": addon.name,
-                    "Plan": get_addon_plan(addon),
-                    "Schedule": style_backup_schedules(backup_schedules),
-                }
-            )
+            yield {
+                "App": addon.app.name,
+                "Addon": addon.name,
+                "Plan": get_addon_plan(addon),
+                "Schedule": style_backup_schedules(backup_schedules),
+            }
 
-    display_data(sorted(results, key=operator.itemgetter("App")), display_format)
+    display_data(get_rows(), display_format, sort_key=operator.itemgetter("App"))
 
 
 @app.command()
@@ -257,34 +187,22 @@ def maintenance_window(
     """
     Audit the maintenance windows for postgres
     """
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
-
-        postgres_addons = [
-            addon
-            for addon in get_addons(executor, apps)
-            if addon.plan.name.startswith(HEROKU_POSTGRES)
-        ]
+    apps = get_apps(team)
 
-        results = []
-        for addon, addon_details in track(
-            zip_map(executor, get_heroku_postgres_details, postgres_addons),
-            description="Probing databases...",
-            total=len(postgres_addons),
-            disable=not SHOW_PROGRESS,
+    def get_rows() -> Iterator[dict]:
+        for addon, addon_details in probe_addons(
+            apps, HEROKU_POSTGRES, get_heroku_postgres_details
         ):
             if missing_only and addon_details["maintenance_window"]:
                 continue
 
-            results.append(
-                {
-                    "App": addon.app.name,
-                    "Addon": addon.name,
-                    "Plan": get_addon_plan(addon),
-                    "Maintenance window": style_maintenance_window(
-                        addon_details["maintenance_window"]
-                    ),
-                }
-            )
+            yield {
+                "App": addon.app.name,
+                "Addon": addon.name,
+                "Plan": get_addon_plan(addon),
+                "Maintenance window": style_maintenance_window(
+                    addon_details["maintenance_window"]
+                ),
+            }
 
-    display_data(sorted(results, key=operator.itemgetter("App")), display_format)
+    display_data(get_rows(), display_format, sort_key=operator.itemgetter("App"))
@@ -0,0 +1,109 @@
+import operator
+from pathlib import Path
+from typing import Annotated, Optional
+from urllib.parse import urlsplit
+
+import rich
+import typer
+from rich.text import Text
+
+from heroku_audit.client import get_session, heroku
+from heroku_audit.crawl import RESOURCES, crawl
+from heroku_audit.format import Format, FormatOption, display_data
+from heroku_audit.options import TeamOption
+from heroku_audit.snapshot import (
+    Snapshot,
+    SnapshotError,
+    diff_records,
+    iter_records,
+)
+from heroku_audit.style import style_change
+
+app = typer.Typer(name="snapshot", help="Capture the Heroku estate for offline use.")
+
+
+def add_apps_by_name(snapshot: Snapshot) -> None:
+    """
+    Reports for a single app look it up by name, so record each app from the
+    listings as if it had been fetched individually.
+    """
+    for key, entry in list(snapshot.responses.items()):
+        path = urlsplit(key.split(" ", 1)[0]).path.strip("/").split("/")
+        if path != ["apps"] and not (path[0] == "teams" and path[2:] == ["apps"]):
+            continue
+
+        for app_data in entry["body"]:
+            snapshot.responses[
+                heroku._url_for("apps", app_data["name"])  # type:ignore[attr-defined]
+            ] = {"status": 200, "body": app_data}
+
+
+@app.command()
+def save(
+    path: Annotated[
+        Path, typer.Argument(help="File to save the snapshot to", dir_okay=False)
+    ],
+    team: TeamOption = None,
+) -> None:
+    """
+    Save the apps, addons and databases, to run reports against offline.
+    """
+    session = get_session()
+    if session.replay is not None:
+        raise typer.BadParameter("Cannot save a snapshot whilst replaying one")
+
+    session.recorder = snapshot = Snapshot()
+
+    apps = crawl(RESOURCES, team)
+
+    add_apps_by_name(snapshot)
+    snapshot.save(path)
+
+    rich.print(f"Saved {len(apps)} apps to {path}")
+
+
+def load_snapshot(path: Path) -> Snapshot:
+    try:
+        return Snapshot.load(path)
+    except SnapshotError as e:
+        rich.print(Text(str(e), style="red"))
+        raise typer.Exit(1) from e
+
+
+def diff(
+    old: Annotated[
+        Path, typer.Argument(help="Earlier snapshot", exists=True, dir_okay=False)
+    ],
+    new: Annotated[
+        Path, typer.Argument(help="Later snapshot", exists=True, dir_okay=False)
+    ],
+    kind: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            "--type",
+            help="Only show changes to this type of resource, eg addon or config-var",
+        ),
+    ] = None,
+    display_format: FormatOption = Format.TABLE,
+) -> None:
+    """
+    Show what changed between 2 snapshots.
+    """
+    changes = diff_records(
+        iter_records(load_snapshot(old)), iter_records(load_snapshot(new))
+    )
+
+    display_data(
+        (
+            {
+                "Type": change.record.kind,
+                "Key": change.record.key,
+                "Change": style_change(change.change),
+                "Details": change.details,
+            }
+            for change in changes
+            if not kind or change.record.kind in kind
+        ),
+        display_format,
+        sort_key=operator.itemgetter("Type", "Key"),
+    )
@@ -1,39 +1,57 @@
 import operator
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional
+from collections import defaultdict
+from collections.abc import Iterator
+from enum import Enum
+from pathlib import Path
+from typing import Annotated, Optional
 
 import typer
 from heroku3.models.collaborator import Collaborator
 from rich.progress import track
 
-from heroku_audit.client import heroku
 from heroku_audit.format import Format, FormatOption, display_data
 from heroku_audit.options import TeamOption
 from heroku_audit.style import style_user_role
 from heroku_audit.utils import (
     SHOW_PROGRESS,
-    get_apps_for_teams,
-    get_team_members,
+    get_apps,
+    get_team_membership,
+    read_list_file,
     zip_map,
 )
 
 app = typer.Typer(name="users", help="Report on Heroku users.")
 
+AccountEmailArgument = Annotated[
+    Optional[str], typer.Argument(help="Email of the user", show_default=False)
+]
 
-def get_member_of_team(team_name: str, email: str) -> Optional[Collaborator]:
-    return next(
-        (
-            collaborator
-            for collaborator in get_team_members(team_name)
-            if collaborator.user.email == email
-        ),
-        None,
-    )
+EmailsFileOption = Annotated[
+    Optional[Path],
+    typer.Option(
+        help="File of user emails, one per line, to report on together",
+        exists=True,
+        dir_okay=False,
+    ),
+]
+
+
+def get_emails(account_email: Optional[str], emails_file: Optional[Path]) -> set[str]:
+    emails = {account_email} if account_email else set()
+
+    if emails_file is not None:
+        emails.update(read_list_file(emails_file))
+
+    if not emails:
+        raise typer.BadParameter("Provide an email, or --emails-file")
+
+    return emails
 
 
 @app.command()
 def access(
-    account_email: str,
+    account_email: AccountEmailArgument = None,
+    emails_file: EmailsFileOption = None,
     team: TeamOption = None,
     display_format: FormatOption = Format.TABLE,
 ) -> None:
@@ -43,62 +61,54 @@ def access(
     # HACK: https://github.com/martyzz1/heroku3.py/pull/133
     Collaborator._strs.append("role")  # type:ignore
 
-    with ThreadPoolExecutor() as executor:
-        apps = heroku.apps() if team is None else get_apps_for_teams(team)
+    emails = get_emails(account_email, emails_file)
+    apps = get_apps(team)
 
-        team_membership = {}
-        teams = {app.team.name for app in apps}
-        for team_name, team_member in track(
-            zip_map(executor, lambda t: get_member_of_team(t, account_email), teams),
-            description="Loading admin status...",
-            total=len(teams),
-            disable=not SHOW_PROGRESS,
-        ):
-            if team_member:
-                team_membership[team_name] = team_member
-
-        app_access = {}
+    team_membership = get_team_membership(
+        {app.team.name for app in apps if app.team is not None}
+    )
 
+    def get_rows() -> Iterator[dict]:
         for app, collaborators in track(
-            zip_map(executor, lambda a: a.collaborators(), apps),
+            zip_map(lambda a: a.collaborators(), apps),
             description="Loading app collaborators...",
             total=len(apps),
             disable=not SHOW_PROGRESS,
         ):
-            target_collaborator = next(
-                (
-                    collaborator
-                    for collaborator in collaborators
-                    if collaborator.user.email == account_email
-                ),
-                None,
-            )
+            team_name = app.team.name if app.team is not None else None
+            app_access = {
+                email: team_membership[email][team_name]
+                for email in emails
+                if team_name in team_membership.get(email, {})
+            }
 
-            if target_collaborator:
-                app_access[app] = target_collaborator
-            elif app.team.name in team_membership:
-                app_access[app] = team_membership[app.team.name]
+            # Being a collaborator takes precedence over team membership
+            app_access.update(
+                (collaborator.user.email, collaborator)
+                for collaborator in collaborators
+                if collaborator.user.email in emails
+            )
 
-    display_data(
-        sorted(
-            (
-                {
+            for email, collaborator in app_access.items():
+                yield {
+                    **({"User": email} if emails_file is not None else {}),
                     "App": app.name,
-                    "Team": app.team.name,
+                    "Team": team_name or "",
                     "Date Given": collaborator.created_at.date().isoformat(),
                     "Role": style_user_role(collaborator.role),
                 }
-                for app, collaborator in app_access.items()
-            ),
-            key=operator.itemgetter("App"),
-        ),
+
+    display_data(
+        get_rows(),
         display_format,
+        sort_key=lambda row: (row.get("User", ""), row["App"]),
     )
 
 
 @app.command()
 def teams(
-    account_email: str,
+    account_email: AccountEmailArgument = None,
+    emails_file: EmailsFileOption = None,
     display_format: FormatOption = Format.TABLE,
 ) -> None:
     """
@@ -107,31 +117,142 @@ def teams(
     # HACK: https://github.com/martyzz1/heroku3.py/pull/133
     Collaborator._strs.append("role")  # type:ignore
 
-    with ThreadPoolExecutor() as executor:
-        # The only teams we know about are the ones for apps we know about
-        teams = {app.team.name for app in heroku.apps()}
+    emails = get_emails(account_email, emails_file)
 
-        team_membership = {}
-        for team_name, team_member in track(
-            zip_map(executor, lambda t: get_member_of_team(t, account_email), teams),
-            description="Loading admin status...",
-            total=len(teams),
-            disable=not SHOW_PROGRESS,
-        ):
-            if team_member:
-                team_membership[team_name] = team_member
+    # The only teams we know about are the ones for apps we know about
+    teams = {app.team.name for app in get_apps() if app.team is not None}
+
+    team_membership = get_team_membership(teams)
 
     display_data(
-        sorted(
+        (
+            {
+                **({"User": email} if emails_file is not None else {}),
+                "Team": team_name,
+                "Date Given": team_member.created_at.date().isoformat(),
+                "Role": style_user_role(team_member.role),
+            }
+            for email in emails
+            for team_name, team_member in team_membership.get(email, {}).items()
+        ),
+        display_format,
+        sort_key=lambda row: (row.get("User", ""), row["Team"]),
+    )
+
+
+def get_grant_role(grant: Collaborator) -> str:
+    # Collaborators on personal apps have no role
+    return grant.role or "collaborator"
+
+
+class GroupBy(str, Enum):
+    USER = "user"
+    APP = "app"
+
+
+@app.command()
+def matrix(
+    role: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            help="Only show access with this role, eg admin, or collaborator for personal apps"
+        ),
+    ] = None,
+    group_by: Annotated[
+        Optional[GroupBy],
+        typer.Option(help="Summarise access for each user or app"),
+    ] = None,
+    team: TeamOption = None,
+    display_format: FormatOption = Format.TABLE,
+) -> None:
+    """
+    Review which users have access to which apps, across every app
+    """
+    # HACK: https://github.com/martyzz1/heroku3.py/pull/133
+    Collaborator._strs.append("role")  # type:ignore
+
+    apps = get_apps(team)
+
+    team_membership = get_team_membership(
+        {app.team.name for app in apps if app.team is not None}
+    )
+
+    # User -> app -> how they have access, and the inverse
+    user_access: dict[str, dict[str, Collaborator]] = defaultdict(dict)
+    app_access: dict[str, dict[str, Collaborator]] = defaultdict(dict)
+
+    team_apps = defaultdict(list)
+    for app in apps:
+        if app.team is not None:
+            team_apps[app.team.name].append(app.name)
+
+    for email, teams in team_membership.items():
+        for team_name, member in teams.items():
+            for app_name in team_apps[team_name]:
+                user_access[email][app_name] = member
+
+    for app, collaborators in track(
+        zip_map(lambda a: a.collaborators(), apps),
+        description="Loading app collaborators...",
+        total=len(apps),
+        disable=not SHOW_PROGRESS,
+    ):
+        # Being a collaborator takes precedence over team membership
+        for collaborator in collaborators:
+            user_access[collaborator.user.email][app.name] = collaborator
+
+    for email, grants in user_access.items():
+        for app_name, grant in list(grants.items()):
+            if role and get_grant_role(grant) not in role:
+                del grants[app_name]
+                continue
+            app_access[app_name][email] = grant
+
+    app_teams = {app.name: app.team.name if app.team else "" for app in apps}
+
+    if group_by == GroupBy.USER:
+        display_data(
             (
                 {
-                    "Team": team_name,
-                    "Date Given": team_membership.created_at.date().isoformat(),
-                    "Role": style_user_role(team_membership.role),
+                    "User": email,
+                    "App Count": len(grants),
+                    "Roles": ", ".join(
+                        sorted({get_grant_role(g) for g in grants.values()})
+                    ),
+                    "Apps": ", ".join(sorted(grants)),
                 }
-                for team_name, team_membership in team_membership.items()
+                for email, grants in user_access.items()
+                if grants
             ),
-            key=operator.itemgetter("Team"),
-        ),
-        display_format,
-    )
+            display_format,
+            sort_key=operator.itemgetter("User"),
+        )
+    elif group_by == GroupBy.APP:
+        display_data(
+            (
+                {
+                    "App": app_name,
+                    "Team": app_teams.get(app_name, ""),
+                    "User Count": len(grants),
+                    "Users": ", ".join(sorted(grants)),
+                }
+                for app_name, grants in app_access.items()
+            ),
+            display_format,
+            sort_key=operator.itemgetter("App"),
+        )
+    else:
+        display_data(
+            (
+                {
+                    "User": email,
+                    "App": app_name,
+                    "Team": app_teams.get(app_name, ""),
+                    "Role": style_user_role(grant.role),
+                }
+                for email, grants in user_access.items()
+                for app_name, grant in grants.items()
+            ),
+            display_format,
+            sort_key=operator.itemgetter("User", "App"),
+        )
@@ -1,13 +1,35 @@
 import os
 import sys
-from typing import Any, cast
+import threading
+from typing import Any, Optional, cast
 
 import heroku3
 import rich
 from heroku3.core import Heroku
 from rich.text import Text
 
-__all__ = ["heroku"]
+from heroku_audit.cache import ResponseCache
+from heroku_audit.config import settings
+from heroku_audit.journal import Journal, JournalError, get_journal_path
+from heroku_audit.ratelimit import governor
+from heroku_audit.session import AuditSession
+from heroku_audit.snapshot import Snapshot, SnapshotError
+
+__all__ = ["heroku", "get_session", "get_api_key", "get_journal"]
+
+
+def get_api_key() -> str:
+    api_key = os.environ.get("HEROKU_API_KEY")
+    if api_key is None:
+        rich.print(
+            Text(
+                "Please set $HEROKU_API_KEY to a valid Heroku API key.",
+                style="red",
+            )
+        )
+        sys.exit(1)
+
+    return api_key.strip()
 
 
 class LazyHerokuWrapper:
@@ -16,25 +38,68 @@ class LazyHerokuWrapper:
     """
 
     _heroku = None
+    _lock = threading.Lock()
 
     def _get_heroku(self) -> Heroku:
         if self._heroku is None:
-            api_key = os.environ.get("HEROKU_API_KEY")
-            if api_key is None:
-                rich.print(
-                    Text(
-                        "Please set $HEROKU_API_KEY to a valid Heroku API key.",
-                        style="red",
-                    )
-                )
+            # Fetches share the client (and its session), so only create one
+            with self._lock:
+                if self._heroku is None:
+                    self._heroku = self._create_heroku()
+        return self._heroku
+
+    def _create_heroku(self) -> Heroku:
+        if settings.snapshot is not None:
+            try:
+                snapshot = Snapshot.load(settings.snapshot)
+            except SnapshotError as e:
+                rich.print(Text(str(e), style="red"))
                 sys.exit(1)
 
-            self._heroku = heroku3.from_key(api_key.strip())
+            # Snapshots are replayed without touching the API, so need no key
+            # (nor the request `from_key` makes to check it)
+            return Heroku(session=AuditSession("", replay=snapshot))
 
-        return self._heroku
+        api_key = get_api_key()
+
+        journal = None
+        if settings.journal or settings.resume:
+            try:
+                journal = Journal(
+                    get_journal_path(api_key, settings.command_args),
+                    api_key,
+                    resume=settings.resume,
+                )
+            except JournalError as e:
+                rich.print(Text(str(e), style="yellow"), file=sys.stderr)
+
+        session = AuditSession(
+            api_key,
+            cache=ResponseCache(api_key) if settings.cache or settings.sync else None,
+            max_age=settings.max_age,
+            sync=settings.sync,
+            concurrency=settings.concurrency,
+            governor=governor,
+            journal=journal,
+        )
+
+        return heroku3.from_key(api_key, session=session)
 
     def __getattr__(self, attr_name: str) -> Any:
         return getattr(self._get_heroku(), attr_name)
 
 
 heroku = cast(Heroku, LazyHerokuWrapper())
+
+
+def get_session() -> AuditSession:
+    return cast(AuditSession, heroku._session)
+
+
+def get_journal() -> Optional[Journal]:
+    """
+    The run's journal, if it has used the API.
+    """
+    if cast(LazyHerokuWrapper, heroku)._heroku is None:
+        return None
+    return get_session().journal
@@ -1,4 +1,6 @@
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
 from typer import get_app_dir
@@ -6,6 +8,29 @@ from typer import get_app_dir
 APP_DIR = Path(get_app_dir("heroku-audit"))
 
 
+@dataclass
+class Settings:
+    """
+    Runtime settings, populated from the global command-line options
+    """
+
+    cache: bool = False
+    max_age: Optional[int] = None
+    sync: bool = False
+    concurrency: int = 16
+    stream: bool = False
+    snapshot: Optional[Path] = None
+    journal: bool = False
+    resume: bool = False
+    keep_going: bool = False
+
+    # The command being run, and its arguments (without the global options)
+    command_args: list[str] = field(default_factory=list)
+
+
+settings = Settings()
+
+
 def load_env_config() -> None:
     env_file = APP_DIR / "config.env"
 
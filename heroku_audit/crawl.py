@@ -0,0 +1,111 @@
+from collections.abc import Collection
+from typing import Callable, Optional, TypeVar
+
+from heroku3.models.addon import Addon
+from heroku3.models.app import App
+from heroku3.models.collaborator import Collaborator
+from rich.progress import track
+
+from heroku_audit.addons import (
+    HEROKU_POSTGRES,
+    HEROKU_REDIS,
+    get_heroku_postgres_backup_schedules,
+    get_heroku_postgres_details,
+    get_heroku_redis_details,
+)
+from heroku_audit.utils import (
+    SHOW_PROGRESS,
+    capture_failure,
+    get_addons,
+    get_apps,
+    get_team_members,
+    zip_map,
+)
+
+T = TypeVar("T")
+
+APP_RESOURCES: dict[str, Callable[[App], object]] = {
+    "formation": lambda app: app.process_formation(),
+    "config-vars": lambda app: app.config(),
+    "domains": App.domains,
+    "collaborators": App.collaborators,
+}
+
+ADDON_RESOURCES: dict[str, tuple[str, Callable[[Addon], object]]] = {
+    "postgres-details": (HEROKU_POSTGRES, get_heroku_postgres_details),
+    "postgres-backup-schedules": (
+        HEROKU_POSTGRES,
+        get_heroku_postgres_backup_schedules,
+    ),
+    "redis-details": (HEROKU_REDIS, get_heroku_redis_details),
+}
+
+TEAM_MEMBERS = "team-members"
+
+ADDONS = "addons"
+
+RESOURCES = [ADDONS, *APP_RESOURCES, *ADDON_RESOURCES, TEAM_MEMBERS]
+
+
+def prefetch(request: tuple[T, Callable[[T], object]]) -> None:
+    item, fetcher = request
+    try:
+        fetcher(item)
+    except Exception as e:
+        if not capture_failure(item, e, fetcher):
+            raise
+
+
+def crawl(resources: Collection[str], team: Optional[str] = None) -> list[App]:
+    """
+    Fetch the given resources for every app, once.
+
+    The responses aren't returned - crawling is only useful when the session
+    is keeping them (eg its memo) for the reports which follow.
+    """
+    apps = get_apps(team)
+
+    app_fetchers = [APP_RESOURCES[r] for r in APP_RESOURCES if r in resources]
+    addon_fetchers = [ADDON_RESOURCES[r] for r in ADDON_RESOURCES if r in resources]
+
+    app_requests = [(app, fetcher) for app in apps for fetcher in app_fetchers]
+    for _app_request in track(
+        zip_map(prefetch, app_requests),
+        description="Crawling apps...",
+        total=len(app_requests),
+        disable=not SHOW_PROGRESS,
+    ):
+        pass
+
+    addons: list[Addon] = []
+    if ADDONS in resources or addon_fetchers:
+        addons.extend(get_addons(apps))
+
+    if TEAM_MEMBERS in resources:
+        # HACK: https://github.com/martyzz1/heroku3.py/pull/133
+        Collaborator._strs.append("role")  # type:ignore
+
+        teams = {app.team.name for app in apps if app.team is not None}
+        for _team in track(
+            zip_map(get_team_members, teams),
+            description="Crawling teams...",
+            total=len(teams),
+            disable=not SHOW_PROGRESS,
+        ):
+            pass
+
+    addon_requests = [
+        (addon, fetcher)
+        for addon in addons
+        for prefix, fetcher in addon_fetchers
+        if addon.plan.name.startswith(prefix)
+    ]
+    for _addon_request in track(
+        zip_map(prefetch, addon_requests),
+        description="Crawling addons...",
+        total=len(addon_requests),
+        disable=not SHOW_PROGRESS,
+    ):
+        pass
+
+    return apps
@@ -0,0 +1,55 @@
+import threading
+from typing import NamedTuple
+
+
+class Failure(NamedTuple):
+    app: str
+    addon: str
+    stage: str
+    status: str
+    error: str
+
+    def to_row(self) -> dict[str, str]:
+        return {
+            "App": self.app,
+            "Addon": self.addon,
+            "Stage": self.stage,
+            "Status": self.status,
+            "Error": self.error,
+        }
+
+
+class FailureLog:
+    """
+    Apps and addons which couldn't be fetched with `--keep-going`, so the rest
+    of the report can still be shown.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: list[Failure] = []
+        self._seen: set[tuple[str, str, str]] = set()
+
+    @property
+    def count(self) -> int:
+        return len(self._seen)
+
+    def record(self, failure: Failure) -> None:
+        # The same resource may be fetched again (eg by each report in a
+        # batch), but only needs reporting once
+        key = (failure.app, failure.addon, failure.stage)
+        with self._lock:
+            if key not in self._seen:
+                self._seen.add(key)
+                self._pending.append(failure)
+
+    def drain(self) -> list[Failure]:
+        """
+        Failures recorded since the last call, to be shown with a report.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+
+failures = FailureLog()
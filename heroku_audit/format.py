@@ -1,14 +1,21 @@
 import csv
 import json
+import sys
+import time
+from collections.abc import Iterable
 from enum import Enum
-from io import StringIO
-from typing import Annotated, Any
+from typing import Annotated, Any, Callable, Optional
 
 import rich
 import typer
+from rich.console import Console
 from rich.protocol import is_renderable
 from rich.table import Table
 
+from heroku_audit.config import settings
+from heroku_audit.failures import failures
+from heroku_audit.metrics import IterationTimer, profiler
+
 
 class RichJSONEncoder(json.JSONEncoder):
     """
@@ -26,36 +33,107 @@ class Format(str, Enum):
     TABLE = "table"
     CSV = "csv"
     JSON = "json"
+    JSONL = "jsonl"
     COUNT = "count"
 
 
 FormatOption = Annotated[Format, typer.Option("--format")]
 
+# Formats which can be written a row at a time
+STREAMABLE_FORMATS = {Format.CSV, Format.JSONL}
 
-def display_data(data: list[dict], display_format: Format) -> None:
-    if display_format == Format.COUNT:
-        print(len(data))
+
+def write_csv(data: Iterable[dict]) -> None:
+    writer = None
+    for row in data:
+        if writer is None:
+            writer = csv.DictWriter(sys.stdout, fieldnames=row.keys())
+            writer.writeheader()
+        writer.writerow(row)
+        sys.stdout.flush()
+
+
+def write_jsonl(data: Iterable[dict]) -> None:
+    for row in data:
+        print(json.dumps(row, cls=RichJSONEncoder), flush=True)
+
+
+def display_data(
+    data: Iterable[dict],
+    display_format: Format,
+    sort_key: Optional[Callable[[dict], Any]] = None,
+    reverse: bool = False,
+) -> None:
+    """
+    Output rows in the given format, sorted by `sort_key`.
+
+    With `--stream`, CSV and JSON Lines rows are written as soon as they're
+    produced, unsorted, rather than once they've all been collected.
+
+    Apps and addons which failed with `--keep-going` are shown afterwards.
+    """
+    # Rows are often still being fetched as they're displayed, so only the time
+    # spent outside of waiting for them counts as rendering
+    start = time.perf_counter()
+    rows_timer = IterationTimer(data)
+    try:
+        write_data(rows_timer, display_format, sort_key, reverse)
+    finally:
+        profiler.record_stage(
+            "display_data", time.perf_counter() - start - rows_timer.seconds
+        )
+
+    # Unless the report is a table, failures go to stderr, so it can still be parsed
+    display_failures(stderr=display_format != Format.TABLE)
+
+
+def display_failures(stderr: bool = True) -> None:
+    """
+    Show which apps and addons are missing from a report, with `--keep-going`.
+    """
+    failed = failures.drain()
+    if not failed:
         return
 
-    if not data:
+    table = Table(
+        "App", "Addon", "Stage", "Status", "Error", title="Failures", style="red"
+    )
+    for failure in sorted(failed):
+        table.add_row(*failure.to_row().values())
+
+    Console(stderr=stderr).print(table)
+
+
+def write_data(
+    data: Iterable[dict],
+    display_format: Format,
+    sort_key: Optional[Callable[[dict], Any]],
+    reverse: bool,
+) -> None:
+    if display_format == Format.COUNT:
+        print(sum(1 for _row in data))
         return
 
-    if display_format == Format.TABLE:
-        headers = data[0].keys()
-        table = Table(*headers)
-        for row in data:
+    if settings.stream and display_format in STREAMABLE_FORMATS:
+        rows: Iterable[dict] = data
+    else:
+        rows = sorted(data, key=sort_key, reverse=reverse) if sort_key else list(data)
+
+    if display_format == Format.CSV:
+        write_csv(rows)
+
+    elif display_format == Format.JSONL:
+        write_jsonl(rows)
+
+    elif display_format == Format.TABLE:
+        table = None
+        for row in rows:
+            if table is None:
+                table = Table(*row.keys())
             values = [v if is_renderable(v) else str(v) for v in row.values()]
             table.add_row(*values)
-        rich.print(table)
-
-    elif display_format == Format.CSV:
-        headers = data[0].keys()
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
-        writer.writerows(data)
-        output.seek(0)
-        print(output.getvalue())
-
-    elif display_format == Format.JSON:
-        print(json.dumps(data, cls=RichJSONEncoder))
+        if table is not None:
+            rich.print(table)
+
+    elif display_format == Format.JSON and rows:
+        print(json.dumps(rows, cls=RichJSONEncoder))
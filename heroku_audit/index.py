@@ -0,0 +1,372 @@
+import base64
+import fnmatch
+import json
+import os
+import re
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, TypedDict
+
+from heroku_audit.config import APP_DIR
+from heroku_audit.matching import PatternMatcher, get_glob_literal, is_literal
+
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
+
+ENV_INDEX_PATH = APP_DIR / "env-index"
+
+ENV_INDEX_VERSION = 1
+
+SALT_SIZE = 16
+
+# Glob patterns need a literal run at least this long to use the n-gram index
+NGRAM_SIZE = 3
+
+
+class EnvIndexError(Exception):
+    pass
+
+
+class DomainIndexError(Exception):
+    pass
+
+
+class AppConfig(TypedDict):
+    team: Optional[str]
+    config: dict[str, str]
+
+
+def get_fernet(api_key: str, salt: bytes) -> "Fernet":
+    """
+    Derive an encryption key from the API key, so the config var index (and
+    journals) can only be read by whoever could have fetched the config vars
+    themselves.
+    """
+    # Only needed for the config var index and journals, so not imported up front
+    from cryptography.fernet import Fernet
+    from cryptography.hazmat.primitives.hashes import SHA256
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    key = HKDF(
+        algorithm=SHA256(), length=32, salt=salt, info=b"heroku-audit env index"
+    ).derive(api_key.encode())
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def get_ngrams(value: str) -> set[str]:
+    return {value[i : i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1)}
+
+
+class EnvIndex:
+    """
+    A local copy of every app's config vars, encrypted at rest, for answering
+    repeated queries without crawling the API.
+
+    Lookups by key and exact value use dictionaries, and glob searches are
+    narrowed down using an n-gram index before being matched.
+    """
+
+    def __init__(
+        self, apps: dict[str, AppConfig], created_at: Optional[str] = None
+    ) -> None:
+        self.apps = apps
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat(
+            timespec="seconds"
+        )
+
+    @cached_property
+    def _entries(self) -> list[tuple[str, str, str]]:
+        return [
+            (app_name, key, value)
+            for app_name, app in self.apps.items()
+            for key, value in app["config"].items()
+        ]
+
+    @cached_property
+    def keys(self) -> dict[str, list[str]]:
+        """
+        Apps using each config var
+        """
+        keys = defaultdict(list)
+        for app_name, key, _value in self._entries:
+            keys[key].append(app_name)
+        return keys
+
+    @cached_property
+    def values(self) -> dict[str, list[int]]:
+        values = defaultdict(list)
+        for i, (_app_name, _key, value) in enumerate(self._entries):
+            values[value].append(i)
+        return values
+
+    @cached_property
+    def ngrams(self) -> dict[str, set[int]]:
+        ngrams = defaultdict(set)
+        for i, (_app_name, _key, value) in enumerate(self._entries):
+            for ngram in get_ngrams(value):
+                ngrams[ngram].add(i)
+        return ngrams
+
+    def get_app_names(self, team: Optional[str] = None) -> list[str]:
+        return [
+            app_name
+            for app_name, app in self.apps.items()
+            if team is None or app["team"] == team
+        ]
+
+    def _get_candidates(self, literal: str) -> Optional[set[int]]:
+        """
+        Entries which could contain the literal, or `None` if it's too short to
+        narrow the search.
+        """
+        ngrams = get_ngrams(literal)
+        if not ngrams:
+            return None
+
+        candidates = None
+        for ngram in sorted(ngrams, key=lambda n: len(self.ngrams.get(n, ()))):
+            postings = self.ngrams.get(ngram, set())
+            candidates = postings if candidates is None else candidates & postings
+            if not candidates:
+                break
+        return candidates
+
+    def search(
+        self, patterns: Iterable[str], team: Optional[str] = None
+    ) -> Iterator[tuple[str, str, list[str]]]:
+        """
+        Find the app and key of each value matching any of the glob patterns,
+        and which patterns it matched.
+        """
+        matches: dict[int, list[str]] = defaultdict(list)
+        unindexed = []
+
+        for pattern in dict.fromkeys(patterns):
+            if is_literal(pattern):
+                for i in self.values.get(pattern, []):
+                    matches[i].append(pattern)
+                continue
+
+            candidates = self._get_candidates(get_glob_literal(pattern))
+            if candidates is None:
+                unindexed.append(pattern)
+                continue
+
+            matcher = re.compile(fnmatch.translate(pattern))
+            for i in candidates:
+                if matcher.match(self._entries[i][2]):
+                    matches[i].append(pattern)
+
+        if unindexed:
+            # Patterns which can't use the index are checked in one pass
+            pattern_matcher = PatternMatcher(unindexed)
+            for i, (_app_name, _key, value) in enumerate(self._entries):
+                matched = pattern_matcher.match(value)
+                if matched:
+                    matches[i].extend(matched)
+
+        for i in sorted(matches):
+            app_name, key, _value = self._entries[i]
+            if team is None or self.apps[app_name]["team"] == team:
+                yield app_name, key, matches[i]
+
+    def save(self, api_key: str, path: Path = ENV_INDEX_PATH) -> None:
+        salt = os.urandom(SALT_SIZE)
+        data = zlib.compress(
+            json.dumps(
+                {
+                    "version": ENV_INDEX_VERSION,
+                    "created_at": self.created_at,
+                    "apps": self.apps,
+                },
+                separators=(",", ":"),
+            ).encode()
+        )
+
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+        # Written to a new file, as an existing one keeps its mode
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.unlink(missing_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(salt + get_fernet(api_key, salt).encrypt(data))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, api_key: str, path: Path = ENV_INDEX_PATH) -> "EnvIndex":
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            raise EnvIndexError(
+                "No config var index found. Create one with `heroku-audit env index`."
+            ) from None
+
+        from cryptography.fernet import InvalidToken
+
+        salt, token = raw[:SALT_SIZE], raw[SALT_SIZE:]
+
+        try:
+            data = json.loads(zlib.decompress(get_fernet(api_key, salt).decrypt(token)))
+        except InvalidToken:
+            raise EnvIndexError(
+                "Unable to decrypt the config var index. Was it created with a different API key?"
+            ) from None
+
+        if data.get("version") != ENV_INDEX_VERSION:
+            raise EnvIndexError(
+                "The config var index is out of date. Recreate it with `heroku-audit env index`."
+            )
+
+        return cls(data["apps"], data["created_at"])
+
+
+DOMAIN_INDEX_PATH = APP_DIR / "domain-index.json"
+
+DOMAIN_INDEX_VERSION = 1
+
+
+class DomainRecord(TypedDict):
+    hostname: str
+    cname: Optional[str]
+    acm_status: Optional[str]
+
+
+class AppDomains(TypedDict):
+    team: Optional[str]
+    version: str
+    indexed_at: float
+    domains: list[DomainRecord]
+
+
+class DomainMatch(NamedTuple):
+    app_name: str
+    domain: DomainRecord
+
+
+class DomainTrie:
+    """
+    Domains stored by their labels in reverse (`com` -> `example` -> `www`),
+    so finding a hostname, its wildcards or everything under a domain only
+    walks as many nodes as the query has labels.
+    """
+
+    def __init__(self) -> None:
+        self.children: dict[str, DomainTrie] = {}
+        self.matches: list[DomainMatch] = []
+
+    @staticmethod
+    def get_labels(hostname: str) -> list[str]:
+        return hostname.lower().rstrip(".").split(".")[::-1]
+
+    def add(self, match: DomainMatch) -> None:
+        node = self
+        for label in self.get_labels(match.domain["hostname"]):
+            node = node.children.setdefault(label, DomainTrie())
+        node.matches.append(match)
+
+    def _find(self, labels: list[str]) -> Optional["DomainTrie"]:
+        node: Optional[DomainTrie] = self
+        for label in labels:
+            if node is None:
+                break
+            node = node.children.get(label)
+        return node
+
+    def who_owns(self, hostname: str) -> list[DomainMatch]:
+        """
+        Domains which route the hostname: an exact match, or a wildcard.
+        """
+        *parents, name = self.get_labels(hostname)
+
+        parent = self._find(parents)
+        if parent is None:
+            return []
+
+        # Wildcards only cover a single label, eg `*.example.com` covers
+        # `www.example.com`, but not `example.com` or `a.b.example.com`
+        exact = parent.children.get(name)
+        wildcard = parent.children.get("*")
+        return [
+            *(exact.matches if exact is not None else []),
+            *(wildcard.matches if wildcard is not None and name != "*" else []),
+        ]
+
+    def under(self, domain: str) -> Iterator[DomainMatch]:
+        """
+        Every domain at or below the given domain.
+        """
+        node = self._find(self.get_labels(domain))
+        if node is None:
+            return
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield from node.matches
+            stack.extend(node.children.values())
+
+
+class DomainIndex:
+    """
+    Every app's domains, saved locally so ownership can be looked up without
+    crawling the API.
+
+    Apps are only re-fetched when they've been updated since they were indexed,
+    or their domains were indexed too long ago.
+    """
+
+    def __init__(
+        self, apps: dict[str, AppDomains], created_at: Optional[str] = None
+    ) -> None:
+        self.apps = apps
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat(
+            timespec="seconds"
+        )
+
+    @cached_property
+    def trie(self) -> DomainTrie:
+        trie = DomainTrie()
+        for app_name, app in self.apps.items():
+            for domain in app["domains"]:
+                trie.add(DomainMatch(app_name, domain))
+        return trie
+
+    def save(self, path: Path = DOMAIN_INDEX_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written to a new file, as an existing one keeps its mode
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.unlink(missing_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "version": DOMAIN_INDEX_VERSION,
+                    "created_at": self.created_at,
+                    "apps": self.apps,
+                },
+                f,
+                separators=(",", ":"),
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DOMAIN_INDEX_PATH) -> "DomainIndex":
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            raise DomainIndexError(
+                "No domain index found. Create one with `heroku-audit domains index`."
+            ) from None
+
+        if data.get("version") != DOMAIN_INDEX_VERSION:
+            raise DomainIndexError(
+                "The domain index is out of date. Recreate it with `heroku-audit domains index --full`."
+            )
+
+        return cls(data["apps"], data["created_at"])
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import zlib
+from collections.abc import Sequence
+from pathlib import Path
+from typing import IO, Optional
+
+import requests
+
+from heroku_audit.cache import CachedResponse
+from heroku_audit.config import APP_DIR
+
+JOURNAL_DIR = APP_DIR / "journals"
+
+
+class JournalError(Exception):
+    pass
+
+
+def get_journal_path(api_key: str, args: Sequence[str]) -> Path:
+    """
+    Identify a run by who ran it, and which command it ran, so `--resume`
+    only picks up where the same command left off.
+    """
+    key = hashlib.sha256()
+    for part in (api_key, *args):
+        key.update(part.encode())
+        key.update(b"\0")
+    return JOURNAL_DIR / f"{key.hexdigest()}.journal"
+
+
+def lock_file(file: IO[bytes]) -> bool:
+    """
+    Take an exclusive lock on an open file, without waiting for it. The lock is
+    released when the file is closed.
+    """
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class Journal:
+    """
+    Every response a run has fetched, appended as it arrives, so an
+    interrupted run can be resumed without fetching them again.
+
+    Responses include config vars, so each is encrypted using the API key, like
+    the config var index. Journals are locked whilst in use, so identical runs
+    can't write over each other's, and are deleted once their command succeeds.
+    """
+
+    def __init__(self, path: Path, api_key: str, resume: bool = False) -> None:
+        # Only needed when journaling, so not imported up front
+        from heroku_audit.index import SALT_SIZE, get_fernet
+
+        self.path = path
+        self.responses: dict[str, CachedResponse] = {}
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, "r+b")
+
+        if not lock_file(self._file):
+            self._file.close()
+            raise JournalError(
+                "Another run of this command is using its journal, so this run won't be journaled."
+            )
+
+        self._file.seek(0)
+        salt = self._file.read(SALT_SIZE) if resume else b""
+        if len(salt) == SALT_SIZE:
+            self._fernet = get_fernet(api_key, salt)
+            self._read()
+        else:
+            salt = os.urandom(SALT_SIZE)
+            self._fernet = get_fernet(api_key, salt)
+            self._file.seek(0)
+            self._file.write(salt)
+
+        # Drop anything after the last complete response, eg a line cut short
+        # when the previous run was interrupted
+        self._file.truncate(self._file.tell())
+        self._file.flush()
+
+    def _read(self) -> None:
+        from cryptography.fernet import InvalidToken
+
+        offset = self._file.tell()
+        for line in self._file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(zlib.decompress(self._fernet.decrypt(line.strip())))
+            except (InvalidToken, ValueError, zlib.error):
+                break
+
+            self.responses[entry["key"]] = CachedResponse(
+                entry["status"],
+                entry["headers"],
+                entry["body"].encode(errors="surrogateescape"),
+                entry["stored_at"],
+            )
+            offset += len(line)
+
+        self._file.seek(offset)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return self.responses.get(key)
+
+    def record(self, key: str, response: requests.Response) -> None:
+        cached = CachedResponse.from_response(response)
+        token = self._fernet.encrypt(
+            zlib.compress(
+                json.dumps(
+                    {
+                        "key": key,
+                        "status": cached.status,
+                        "headers": cached.headers,
+                        "body": cached.body.decode(errors="surrogateescape"),
+                        "stored_at": cached.stored_at,
+                    },
+                    separators=(",", ":"),
+                ).encode()
+            )
+        )
+
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(token + b"\n")
+            self._file.flush()
+            self.recorded += 1
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    @property
+    def response_count(self) -> int:
+        return len(self.responses) + self.recorded
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def delete(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,138 @@
+import fnmatch
+import re
+from collections import defaultdict, deque
+from collections.abc import Iterable
+
+GLOB_CLASS_RE = re.compile(r"\[[^\]]*\]")
+GLOB_SPECIAL_RE = re.compile(r"[*?\[\]\0]")
+
+
+def is_literal(pattern: str) -> bool:
+    return not GLOB_SPECIAL_RE.search(pattern)
+
+
+def get_glob_literal(pattern: str) -> str:
+    """
+    The longest run of literal characters in a glob, which any match must contain.
+    """
+    return max(GLOB_SPECIAL_RE.split(GLOB_CLASS_RE.sub("\0", pattern)), key=len)
+
+
+class AhoCorasick:
+    """
+    Find which of many substrings occur in a value, in a single pass over it.
+    """
+
+    def __init__(self, needles: dict[str, list[str]]) -> None:
+        """
+        `needles` maps each substring to the patterns it represents.
+        """
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail = [0]
+        self._output: list[list[str]] = [[]]
+
+        for needle, patterns in needles.items():
+            node = 0
+            for char in needle:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node].extend(patterns)
+
+        # Breadth-first, so each node's failure link is built before its children's
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = (
+                    self._output[child] + self._output[self._fail[child]]
+                )
+
+    def search(self, value: str) -> set[str]:
+        found: set[str] = set()
+        node = 0
+        for char in value:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found.update(self._output[node])
+        return found
+
+
+class PatternMatcher:
+    """
+    Match values against many glob patterns at once, reporting which matched.
+
+    Each kind of pattern uses the cheapest way to find it:
+
+    - Patterns without wildcards must match exactly, so are found with a lookup
+    - `*text*` searches are found together in a single pass, with Aho-Corasick
+    - Anything else is combined into a single regex
+    """
+
+    def __init__(self, patterns: Iterable[str], ignore_case: bool = False) -> None:
+        self.patterns = list(dict.fromkeys(patterns))
+        self.ignore_case = ignore_case
+
+        self._exact: dict[str, list[str]] = defaultdict(list)
+        substrings: dict[str, list[str]] = defaultdict(list)
+        self._globs: dict[str, re.Pattern] = {}
+
+        flags = re.IGNORECASE if ignore_case else 0
+
+        for pattern in self.patterns:
+            inner = pattern[1:-1]
+            if is_literal(pattern):
+                self._exact[self._normalize(pattern)].append(pattern)
+            elif (
+                len(pattern) > 2
+                and pattern.startswith("*")
+                and pattern.endswith("*")
+                and is_literal(inner)
+            ):
+                substrings[self._normalize(inner)].append(pattern)
+            else:
+                self._globs[pattern] = re.compile(fnmatch.translate(pattern), flags)
+
+        self._substrings = AhoCorasick(substrings) if substrings else None
+
+        # A single regex finds whether any glob matches, so each is only
+        # checked individually for the (few) values which match one
+        self._any_glob = (
+            re.compile(
+                "|".join(f"(?:{glob.pattern})" for glob in self._globs.values()),
+                flags,
+            )
+            if self._globs
+            else None
+        )
+
+    def _normalize(self, value: str) -> str:
+        return value.casefold() if self.ignore_case else value
+
+    def match(self, value: str) -> list[str]:
+        """
+        The patterns matching the value, if any.
+        """
+        normalized = self._normalize(value)
+        matched = list(self._exact.get(normalized, []))
+
+        if self._substrings is not None:
+            matched.extend(self._substrings.search(normalized))
+
+        if self._any_glob is not None and self._any_glob.match(value):
+            matched.extend(
+                pattern for pattern, glob in self._globs.items() if glob.match(value)
+            )
+
+        return matched
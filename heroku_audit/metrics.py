@@ -0,0 +1,219 @@
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+from urllib.parse import urlsplit
+
+from heroku_audit.tracing import tracer
+
+# Path segments following these are identifiers, so are grouped together
+ENDPOINT_PARAMS = {
+    "apps": "{app}",
+    "teams": "{team}",
+    "addons": "{addon}",
+    "databases": "{database}",
+}
+
+# Upper bounds of the latency histogram's buckets, in milliseconds
+HISTOGRAM_BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, math.inf]
+
+PERCENTILES = [50, 95, 99]
+
+NUMBER_RE = re.compile(r"^\d+$")
+
+T = TypeVar("T")
+
+
+def get_endpoint(url: str) -> str:
+    """
+    Group a URL with others for the same kind of resource, eg
+    `api.heroku.com/apps/{app}/config-vars`.
+    """
+    parsed = urlsplit(url)
+    parts = parsed.path.strip("/").split("/")
+    for i in range(1, len(parts)):
+        if parts[i - 1] in ENDPOINT_PARAMS and not ENDPOINT_PARAMS.get(parts[i]):
+            parts[i] = ENDPOINT_PARAMS[parts[i - 1]]
+        elif NUMBER_RE.match(parts[i]):
+            parts[i] = "{id}"
+    return f"{parsed.hostname}/{'/'.join(parts)}"
+
+
+def get_percentile(values: list[float], percentile: float) -> float:
+    """
+    The nearest-rank percentile of some sorted values.
+    """
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+class IterationTimer(Generic[T]):
+    """
+    Iterate over an iterable, timing how long is spent waiting for its items.
+    """
+
+    def __init__(self, iterable: Iterable[T]) -> None:
+        self._iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self) -> "IterationTimer[T]":
+        return self
+
+    def __next__(self) -> T:
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+@dataclass
+class EndpointStats:
+    durations: list[float] = field(default_factory=list)
+    cached: int = 0
+    errors: int = 0
+    retries: int = 0
+    bytes: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        durations = sorted(self.durations)
+        histogram = dict.fromkeys(HISTOGRAM_BUCKETS, 0)
+        for duration in durations:
+            bucket = next(b for b in HISTOGRAM_BUCKETS if duration * 1000 <= b)
+            histogram[bucket] += 1
+
+        return {
+            "requests": len(durations),
+            "cached": self.cached,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            **{
+                f"p{percentile}_ms": round(
+                    get_percentile(durations, percentile) * 1000, 1
+                )
+                for percentile in PERCENTILES
+            },
+            "max_ms": round(max(durations, default=0) * 1000, 1),
+            "histogram_ms": {
+                ("inf" if math.isinf(bucket) else str(bucket)): count
+                for bucket, count in histogram.items()
+            },
+        }
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+
+
+class Profiler:
+    """
+    Record where a run's time goes, for `--profile`.
+
+    Every request the session makes is timed, grouped by endpoint. Pipeline
+    stages (listing apps, fanning out fetches, probing addons and rendering)
+    are timed as a whole.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.endpoints: dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.stages: dict[str, StageStats] = defaultdict(StageStats)
+        self.connections: dict[str, int] = defaultdict(int)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started_at = time.perf_counter()
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """
+        Count a request as in flight, to find the peak concurrency.
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def record_request(
+        self, url: str, status: int, duration: float, size: int, retry: bool
+    ) -> None:
+        endpoint = get_endpoint(url)
+        with self._lock:
+            stats = self.endpoints[endpoint]
+            stats.durations.append(duration)
+            stats.bytes += size
+            if status >= 400:
+                stats.errors += 1
+            if retry:
+                stats.retries += 1
+
+    def record_cached(self, url: str) -> None:
+        """
+        Record a response served without a request.
+        """
+        endpoint = get_endpoint(url)
+        with self._lock:
+            self.endpoints[endpoint].cached += 1
+
+    def record_connection(self, host: str) -> None:
+        """
+        Record a new connection being opened, rather than one being reused.
+        """
+        with self._lock:
+            self.connections[host] += 1
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            with tracer.span(name):
+                yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def stage_iter(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """
+        Time iterating over a generator as a stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield from tracer.iterate(name, iterable)
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.stages[name]
+            stats.calls += 1
+            stats.seconds += seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "seconds": round(time.perf_counter() - self.started_at, 3),
+                "max_concurrency": self.max_in_flight,
+                "connections": dict(sorted(self.connections.items())),
+                "endpoints": {
+                    endpoint: stats.to_dict()
+                    for endpoint, stats in sorted(self.endpoints.items())
+                },
+                "stages": {
+                    name: {"calls": stats.calls, "seconds": round(stats.seconds, 3)}
+                    for name, stats in self.stages.items()
+                },
+            }
+
+
+profiler = Profiler()
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+
+# Heroku allows 4500 requests per hour, refilled continuously
+RATE_LIMIT = 4500
+REFILL_RATE = RATE_LIMIT / 3600
+
+# Leave some of the budget for everything else using the same account
+RESERVE = 100
+
+# How much of the budget can be left before requests start slowing down
+SLOWDOWN_LEVEL = 0.5
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+
+def get_retry_delay(response: Optional[requests.Response], attempt: int) -> float:
+    """
+    Exponential backoff with full jitter, respecting `Retry-After`
+    """
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+    if response is None:
+        return delay
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None and retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    elif response.status_code == 429:
+        # Wait for at least one request's worth of budget to come back
+        delay = max(delay, 1 / REFILL_RATE)
+
+    return delay
+
+
+class TokenBucket:
+    def __init__(self, remaining: int) -> None:
+        self.initial_remaining = remaining
+        self.remaining = remaining
+        self.tokens = float(remaining - RESERVE)
+        self.updated_at = time.monotonic()
+        self.next_at = self.updated_at
+
+    @property
+    def level(self) -> float:
+        """
+        How much of the budget is left, from 0 (down to the reserve) to 1 (full)
+        """
+        return min(max(self.tokens / (RATE_LIMIT - RESERVE), 0.0), 1.0)
+
+    def take(self) -> float:
+        """
+        Take a token, returning how long to wait before using it
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.tokens + (now - self.updated_at) * REFILL_RATE, RATE_LIMIT - RESERVE
+        )
+        self.updated_at = now
+
+        # Space requests out more as the budget shrinks, from not at all until
+        # it's down to the slowdown level, to the refill rate at the reserve
+        slowdown = max(SLOWDOWN_LEVEL - self.level, 0.0) / SLOWDOWN_LEVEL
+        start = max(now, self.next_at)
+        self.next_at = start + slowdown / REFILL_RATE
+
+        self.tokens -= 1
+        return max(start - now, -self.tokens / REFILL_RATE)
+
+
+class RateLimitGovernor:
+    """
+    Pace requests against Heroku's rate limit, shared by every request in a run.
+
+    Each host reporting `RateLimit-Remaining` gets a token bucket tracking the
+    remaining budget. Whilst there's plenty left, requests go straight through.
+    Past that, requests are spaced further apart as it shrinks, slowing to the
+    refill rate once it's drained, so concurrent workers slow down smoothly
+    rather than failing with 429s.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._in_flight: dict[str, int] = defaultdict(int)
+        self.requests = 0
+        self.retries = 0
+        self.throttled_for = 0.0
+
+    def acquire(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        with self._lock:
+            self.requests += 1
+            self._in_flight[host] += 1
+            bucket = self._buckets.get(host)
+            delay = bucket.take() if bucket is not None else 0.0
+            self.throttled_for += delay
+
+        if delay:
+            time.sleep(delay)
+
+    def release(self, url: str, response: Optional[requests.Response]) -> None:
+        """
+        Finish a request, updating the budget from its response, if it had one.
+        """
+        host = urlsplit(url).netloc
+        remaining = response.headers.get("RateLimit-Remaining") if response else None
+
+        with self._lock:
+            self._in_flight[host] -= 1
+
+            if remaining is None or not remaining.isdigit():
+                return
+
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                self._buckets[host] = TokenBucket(int(remaining))
+            else:
+                # The API is the source of truth for what's left, but doesn't
+                # yet count requests which are still in flight
+                bucket.remaining = int(remaining)
+                bucket.tokens = float(
+                    bucket.remaining - RESERVE - self._in_flight[host]
+                )
+                bucket.updated_at = time.monotonic()
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return min((b.remaining for b in self._buckets.values()), default=None)
+
+    @property
+    def consumed(self) -> int:
+        return sum(b.initial_remaining - b.remaining for b in self._buckets.values())
+
+    def get_summary(self) -> Optional[str]:
+        if not self.requests:
+            return None
+
+        summary = f"Made {self.requests} API requests"
+        if self.remaining is not None:
+            summary += f", using {self.consumed} of the rate limit ({self.remaining} remaining)"
+        if self.retries:
+            summary += f", {self.retries} retried"
+        if self.throttled_for:
+            summary += f", throttled for {self.throttled_for:.1f}s"
+        return summary
+
+
+governor = RateLimitGovernor()
@@ -0,0 +1,313 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from heroku_audit.cache import (
+    ADDON_LISTING_RE,
+    APP_LISTING_RE,
+    APP_RESOURCE_RE,
+    CACHEABLE_STATUSES,
+    SYNC_MAX_AGE,
+    CachedResponse,
+    ResponseCache,
+    get_app_version,
+    get_cache_key,
+    get_ttl,
+)
+from heroku_audit.journal import Journal
+from heroku_audit.metrics import get_endpoint, profiler
+from heroku_audit.ratelimit import (
+    MAX_RETRIES,
+    RETRY_STATUSES,
+    RateLimitGovernor,
+    get_retry_delay,
+)
+from heroku_audit.snapshot import Snapshot, SnapshotMissingError, get_snapshot_key
+from heroku_audit.tracing import SPAN_KIND_CLIENT, tracer
+from heroku_audit.transport import PooledAdapter
+
+
+class AuditSession(requests.Session):
+    """
+    A `requests` session which serves repeated `GET`s from the response cache,
+    or from memory when the memo is enabled. Identical `GET`s made at the same
+    time share a single request.
+
+    Once a cached response expires, it's revalidated using its `ETag`, so
+    unchanged resources only cost a `304`.
+
+    Requests which do reach the API are paced by the rate limit governor, and
+    retried if they're rate limited or hit a server error.
+
+    When syncing, app and addon listings are always revalidated, and the resources of
+    apps which haven't changed since they were cached are reused.
+
+    When replaying a snapshot, every request is answered from it, without
+    touching the network.
+
+    With a journal, every response is also appended to it, and responses
+    journaled by an earlier, interrupted run are reused.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[ResponseCache] = None,
+        max_age: Optional[int] = None,
+        concurrency: int = 10,
+        governor: Optional[RateLimitGovernor] = None,
+        replay: Optional[Snapshot] = None,
+        sync: bool = False,
+        journal: Optional[Journal] = None,
+    ) -> None:
+        super().__init__()
+        self.mount("https://", PooledAdapter(concurrency))
+        self._api_key = api_key
+        self.cache = cache
+        self.max_age = max_age
+        self.governor = governor or RateLimitGovernor()
+        self.memo: Optional[dict[str, CachedResponse]] = None
+        self.replay = replay
+        self.recorder: Optional[Snapshot] = None
+        self.sync = sync
+        self.journal = journal
+
+        # The current version of each app, as of the latest listing
+        self.app_versions: dict[str, str] = {}
+
+        # Requests currently being made, so identical ones can wait for them
+        self._in_flight: dict[str, Future[CachedResponse]] = {}
+        self._in_flight_lock = threading.Lock()
+
+    def request(  # type:ignore[override]
+        self, method: str, url: str, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        if self.replay is None and method.upper() != "GET":
+            return self._send(method, url, *args, **kwargs)
+
+        request_headers: CaseInsensitiveDict[Any] = CaseInsensitiveDict()
+        request_headers.update(self.headers)
+        request_headers.update(kwargs.get("headers") or {})
+        full_url = str(
+            requests.Request(method, url, params=kwargs.get("params")).prepare().url
+        )
+
+        if self.replay is not None:
+            return self._replay(method, full_url, request_headers)
+
+        cache_key = get_cache_key(self._api_key, full_url, request_headers)
+
+        if self.memo is not None and cache_key in self.memo:
+            profiler.record_cached(full_url)
+            return self.memo[cache_key].to_response(full_url)
+
+        with self._in_flight_lock:
+            shared = self._in_flight.get(cache_key)
+            if shared is None:
+                pending = self._in_flight[cache_key] = Future()
+
+        if shared is not None:
+            # An identical request is already being made, so share its response
+            shared_response = shared.result()
+            profiler.record_cached(full_url)
+            return shared_response.to_response(full_url)
+
+        try:
+            response = self._fetch(
+                cache_key, full_url, request_headers, method, url, *args, **kwargs
+            )
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(CachedResponse.from_response(response))
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[cache_key]
+
+        return response
+
+    def _fetch(
+        self,
+        cache_key: str,
+        full_url: str,
+        request_headers: CaseInsensitiveDict[Any],
+        method: str,
+        url: str,
+        *args: Any,
+        **kwargs: Any,
+    ) -> requests.Response:
+        journaled = self.journal.get(cache_key) if self.journal is not None else None
+
+        if journaled is not None:
+            profiler.record_cached(full_url)
+            response = journaled.to_response(full_url)
+        elif self.cache is not None:
+            response = self._cached_request(
+                cache_key, full_url, method, url, *args, **kwargs
+            )
+        else:
+            response = self._send(method, url, *args, **kwargs)
+
+        if response.status_code in CACHEABLE_STATUSES:
+            if self.journal is not None and journaled is None:
+                self.journal.record(cache_key, response)
+            if self.sync and APP_LISTING_RE.match(urlsplit(url).path):
+                self.app_versions.update(
+                    (app["name"], get_app_version(app)) for app in response.json()
+                )
+            if self.memo is not None:
+                self.memo[cache_key] = CachedResponse.from_response(response)
+            if self.recorder is not None:
+                self.recorder.record(
+                    get_snapshot_key(full_url, request_headers), response
+                )
+
+        return response
+
+    def _replay(
+        self, method: str, full_url: str, headers: CaseInsensitiveDict[Any]
+    ) -> requests.Response:
+        assert self.replay is not None
+
+        replayed = (
+            self.replay.get(get_snapshot_key(full_url, headers))
+            if method.upper() == "GET"
+            else None
+        )
+        if replayed is not None:
+            profiler.record_cached(full_url)
+            return replayed.to_response(full_url)
+
+        raise SnapshotMissingError(
+            f"The snapshot doesn't include {method.upper()} {get_endpoint(full_url)} "
+            f"(eg {urlsplit(full_url).path}). Re-run `heroku-audit snapshot save` "
+            "with the same scope (eg --team) as the report."
+        )
+
+    def enable_memo(self) -> None:
+        """
+        Keep every response for the rest of the run, so each resource is only
+        fetched once, however many reports need it.
+        """
+        if self.memo is None:
+            self.memo = {}
+
+    def _cached_request(
+        self,
+        cache_key: str,
+        full_url: str,
+        method: str,
+        url: str,
+        *args: Any,
+        **kwargs: Any,
+    ) -> requests.Response:
+        assert self.cache is not None
+
+        max_age = self.max_age if self.max_age is not None else get_ttl(url)
+        app_version = None
+
+        if self.sync:
+            path = urlsplit(url).path
+            if APP_LISTING_RE.match(path):
+                # The listing says which apps have changed, so must be current
+                max_age = 0
+            elif ADDON_LISTING_RE.match(path):
+                # Bulk listings span many apps, so can't be tied to one's version
+                max_age = 0
+            elif match := APP_RESOURCE_RE.match(path):
+                app_version = self.app_versions.get(match["app"])
+
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            if self.max_age is None and app_version is not None:
+                # Reuse resources until their app changes, rather than expiring
+                max_age = SYNC_MAX_AGE if cached.app_version == app_version else 0
+
+            if cached.age < max_age:
+                profiler.record_cached(full_url)
+                return cached.to_response(full_url)
+
+            if cached.etag is not None:
+                kwargs["headers"] = {
+                    **(kwargs.get("headers") or {}),
+                    "If-None-Match": cached.etag,
+                }
+
+        response = self._send(method, url, *args, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            self.cache.refresh(cache_key, app_version)
+            return cached.to_response(full_url)
+
+        if response.status_code in CACHEABLE_STATUSES:
+            self.cache.set(cache_key, response, app_version)
+
+        return response
+
+    def _send(
+        self, method: str, url: str, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        # Only retry requests which are safe to repeat
+        max_retries = MAX_RETRIES if method.upper() == "GET" else 0
+
+        for attempt in range(max_retries + 1):
+            self.governor.acquire(url)
+            received: Optional[requests.Response] = None
+
+            endpoint = get_endpoint(url)
+            start = time.perf_counter()
+            try:
+                with (
+                    tracer.span(
+                        f"{method.upper()} {endpoint}",
+                        {
+                            "http.request.method": method.upper(),
+                            "url.full": url,
+                            "url.template": endpoint,
+                            "http.request.resend_count": attempt or None,
+                        },
+                        kind=SPAN_KIND_CLIENT,
+                    ) as span,
+                    profiler.request(),
+                ):
+                    response = received = super().request(method, url, *args, **kwargs)
+                    if span is not None:
+                        span.set_attribute(
+                            "http.response.status_code", response.status_code
+                        )
+                        if response.status_code >= 400:
+                            span.set_error(str(response.status_code))
+            except (requests.ConnectionError, requests.Timeout):
+                # The connection failed before there was a response to retry
+                if attempt == max_retries:
+                    raise
+            finally:
+                self.governor.release(url, received)
+
+            if received is None:
+                self.governor.record_retry()
+                time.sleep(get_retry_delay(None, attempt))
+                continue
+
+            profiler.record_request(
+                url,
+                response.status_code,
+                time.perf_counter() - start,
+                len(response.content),
+                retry=attempt > 0,
+            )
+
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                break
+
+            response.close()
+            self.governor.record_retry()
+            time.sleep(get_retry_delay(response, attempt))
+
+        return response
@@ -0,0 +1,342 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from collections.abc import Iterator, Mapping
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from heroku_audit.cache import CachedResponse
+
+SNAPSHOT_VERSION = 2
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class SnapshotMissingError(SnapshotError):
+    """
+    A request made whilst replaying a snapshot, which the snapshot can't answer.
+    """
+
+
+def get_snapshot_key(url: str, headers: Mapping[str, Any]) -> str:
+    range_header = headers.get("Range")
+    return f"{url} {range_header}" if range_header else url
+
+
+class Snapshot:
+    """
+    A point-in-time capture of API responses, which can be replayed without
+    the network.
+
+    Snapshots are stored as gzipped JSON, with each response body kept as JSON
+    rather than a string, so they compress well and can be inspected.
+    """
+
+    def __init__(
+        self,
+        created_at: Optional[str] = None,
+        responses: Optional[dict[str, dict]] = None,
+    ) -> None:
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat(
+            timespec="seconds"
+        )
+        self.responses = responses if responses is not None else {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, response: requests.Response) -> None:
+        entry = {"status": response.status_code, "body": response.json()}
+        if "Next-Range" in response.headers:
+            entry["next_range"] = response.headers["Next-Range"]
+
+        with self._lock:
+            self.responses[key] = entry
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.responses.get(key)
+        if entry is None:
+            return None
+
+        headers = {"Content-Type": "application/json"}
+        if "next_range" in entry:
+            headers["Next-Range"] = entry["next_range"]
+
+        return CachedResponse(
+            entry["status"], headers, json.dumps(entry["body"]).encode(), 0
+        )
+
+    def save(self, path: Path) -> None:
+        # Snapshots contain config vars, so are only readable by their owner.
+        # They're written to a new file, as an existing one keeps its mode.
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with (
+            os.fdopen(fd, "wb") as raw,
+            gzip.GzipFile(fileobj=raw, mode="wb") as compressed,
+            io.TextIOWrapper(compressed, encoding="utf-8") as f,
+        ):
+            json.dump(
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "created_at": self.created_at,
+                    "responses": dict(sorted(self.responses.items())),
+                },
+                f,
+                separators=(",", ":"),
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Snapshot":
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Unable to read snapshot {path}: {e}") from e
+
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError(
+                f"Unsupported snapshot version {data.get('version')} in {path}"
+            )
+
+        return cls(data["created_at"], data["responses"])
+
+
+class Record(NamedTuple):
+    """
+    A single audited resource, eg an app's addon or config var
+    """
+
+    kind: str
+    key: str
+    fields: dict[str, Any]
+    digest: str
+
+    # Secret fields are compared, but their values never shown
+    secret: bool = False
+
+    @classmethod
+    def create(
+        cls, kind: str, key: str, fields: dict[str, Any], secret: bool = False
+    ) -> "Record":
+        digest = hashlib.sha256(
+            json.dumps(fields, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return cls(kind, key, {} if secret else fields, digest, secret)
+
+
+def get_info(data: dict, name: str) -> Optional[str]:
+    """
+    Read a value from a Heroku Data API `info` list
+    """
+    return next(
+        (", ".join(map(str, i["values"])) for i in data["info"] if i["name"] == name),
+        None,
+    )
+
+
+def get_addon_record(app_name: str, addon: dict) -> Record:
+    return Record.create(
+        "addon",
+        f"{app_name}/{addon['name']}",
+        {
+            "plan": addon["plan"]["name"],
+            "attachments": sorted(addon.get("config_vars") or []),
+        },
+    )
+
+
+def iter_records(snapshot: Snapshot) -> Iterator[Record]:
+    """
+    Extract the audited resources from a snapshot's responses.
+    """
+    responses = [
+        (urlsplit(key.split(" ", 1)[0]), entry["body"])
+        for key, entry in snapshot.responses.items()
+    ]
+
+    addon_names = {
+        addon["id"]: f"{addon['app']['name']}/{addon['name']}"
+        for url, body in responses
+        if url.path.endswith("/addons")
+        for addon in body
+    }
+
+    for url, body in responses:
+        path = url.path.strip("/").split("/")
+
+        if url.hostname in {
+            "postgres-api.heroku.com",
+            "postgres-starter-api.heroku.com",
+        }:
+            addon_name = addon_names.get(path[3], path[3])
+            if path[4:] == ["transfer-schedules"]:
+                yield Record.create(
+                    "backup-schedule",
+                    addon_name,
+                    {
+                        "schedules": sorted(
+                            f"{s['hour']}:00 {s['timezone']}" for s in body
+                        )
+                    },
+                )
+            else:
+                yield Record.create(
+                    "postgres",
+                    addon_name,
+                    {
+                        "version": get_info(body, "PG Version"),
+                        "maintenance_window": get_info(body, "Maintenance window"),
+                    },
+                )
+
+        elif url.hostname == "redis-api.heroku.com":
+            yield Record.create(
+                "redis",
+                addon_names.get(path[3], path[3]),
+                {
+                    "version": get_info(body, "Version"),
+                    "maxmemory_policy": get_info(body, "Maxmemory"),
+                    "maintenance_window": get_info(body, "Maintenance window"),
+                },
+            )
+
+        elif path == ["apps"] or (path[0] == "teams" and path[2:] == ["apps"]):
+            for app in body:
+                yield Record.create(
+                    "app",
+                    app["name"],
+                    {
+                        "team": (app.get("team") or {}).get("name"),
+                        "stack": (app.get("stack") or {}).get("name"),
+                        "region": (app.get("region") or {}).get("name"),
+                        "maintenance": app.get("maintenance"),
+                    },
+                )
+
+        elif path == ["addons"] or (path[0] == "teams" and path[2:] == ["addons"]):
+            for addon in body:
+                yield get_addon_record(addon["app"]["name"], addon)
+
+        elif path[0] == "teams" and path[2:] == ["members"]:
+            for member in body:
+                yield Record.create(
+                    "team-member",
+                    f"{path[1]}/{member['user']['email']}",
+                    {"role": member.get("role")},
+                )
+
+        elif path[0] == "apps" and len(path) == 3:
+            app_name, resource = path[1], path[2]
+
+            if resource == "addons":
+                for addon in body:
+                    yield get_addon_record(app_name, addon)
+            elif resource == "domains":
+                for domain in body:
+                    yield Record.create(
+                        "domain",
+                        f"{app_name}/{domain['hostname']}",
+                        {
+                            "cname": domain.get("cname"),
+                            "acm_status": domain.get("acm_status"),
+                        },
+                    )
+            elif resource == "collaborators":
+                for collaborator in body:
+                    yield Record.create(
+                        "collaborator",
+                        f"{app_name}/{collaborator['user']['email']}",
+                        {"role": collaborator.get("role")},
+                    )
+            elif resource == "config-vars":
+                for name, value in body.items():
+                    yield Record.create(
+                        "config-var",
+                        f"{app_name}/{name}",
+                        {"value": value},
+                        secret=True,
+                    )
+            elif resource == "formation":
+                for formation in body:
+                    yield Record.create(
+                        "formation",
+                        f"{app_name}/{formation['type']}",
+                        {
+                            "size": formation.get("size"),
+                            "quantity": formation.get("quantity"),
+                        },
+                    )
+
+
+class Change(str, Enum):
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+
+
+def format_value(value: Any) -> str:
+    if isinstance(value, list):
+        return " ".join(map(str, value))
+    return str(value)
+
+
+class RecordChange(NamedTuple):
+    change: Change
+    record: Record
+    previous: Optional[Record] = None
+
+    @property
+    def details(self) -> str:
+        if self.record.secret:
+            return ""
+
+        if self.previous is None:
+            return ", ".join(
+                f"{k}: {format_value(v)}" for k, v in self.record.fields.items() if v
+            )
+
+        return ", ".join(
+            f"{k}: {format_value(self.previous.fields.get(k))} -> {format_value(v)}"
+            for k, v in self.record.fields.items()
+            if self.previous.fields.get(k) != v
+        )
+
+
+def diff_records(
+    old: Iterator[Record], new: Iterator[Record]
+) -> Iterator[RecordChange]:
+    """
+    Compare 2 sets of records, by their kind and key.
+
+    Records are compared by digest, and the new records are compared as
+    they're read rather than collected, so this is linear in the number of
+    records.
+    """
+    previous = {(r.kind, r.key): r for r in old}
+    seen = set()
+
+    for record in new:
+        record_id = (record.kind, record.key)
+        if record_id in seen:
+            continue
+        seen.add(record_id)
+
+        old_record = previous.pop(record_id, None)
+        if old_record is None:
+            yield RecordChange(Change.ADDED, record)
+        elif old_record.digest != record.digest:
+            yield RecordChange(Change.CHANGED, record, old_record)
+
+    for old_record in previous.values():
+        yield RecordChange(Change.REMOVED, old_record)
@@ -4,7 +4,8 @@ from rich.console import RenderableType
 from rich.text import Text
 
 if TYPE_CHECKING:
-    from heroku_audit.cli.postgres import HerokuBackupSchedule
+    from heroku_audit.addons import HerokuBackupSchedule
+    from heroku_audit.snapshot import Change
 
 
 def style_user_role(role: Optional[str]) -> RenderableType:
@@ -56,3 +57,11 @@ def style_hostname(hostname: str) -> RenderableType:
     if hostname.endswith("herokuapp.com"):
         return Text(hostname, style="purple")
     return Text(hostname)
+
+
+def style_change(change: "Change") -> RenderableType:
+    if change.value == "added":
+        return Text(change.value, style="green")
+    elif change.value == "removed":
+        return Text(change.value, style="red")
+    return Text(change.value, style="yellow")
@@ -0,0 +1,219 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+from heroku_audit import __version__
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# https://opentelemetry.io/docs/specs/otel/trace/api/#spankind
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+# https://opentelemetry.io/docs/specs/otel/trace/api/#set-status
+STATUS_CODE_ERROR = 2
+
+AttributeValue = Any
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_span_id: Optional[str]
+    kind: int
+    start_time: int = field(default_factory=time.time_ns)
+    end_time: Optional[int] = None
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.error = message
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def to_any_value(value: AttributeValue) -> dict[str, Any]:
+    # OTLP JSON encodes 64-bit integers as strings
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    elif isinstance(value, int):
+        return {"intValue": str(value)}
+    elif isinstance(value, float):
+        return {"doubleValue": value}
+    elif isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [to_any_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def to_attributes(attributes: dict[str, AttributeValue]) -> list[dict[str, Any]]:
+    return [
+        {"key": key, "value": to_any_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class Tracer:
+    """
+    Record spans for `--trace`, and export them as OTLP JSON.
+
+    Spans are only kept in memory whilst the command runs, and written to a
+    file once it finishes, so no collector needs to be reachable. The current
+    span is held in a context variable, so work submitted with `submit` is
+    parented to the span which submitted it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        attributes: Optional[dict[str, AttributeValue]] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+    ) -> Iterator[Optional[Span]]:
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            span_id=os.urandom(8).hex(),
+            parent_span_id=parent.span_id if parent is not None else None,
+            kind=kind,
+            attributes=dict(attributes or {}),
+        )
+
+        # Restore the parent explicitly, rather than with a token, as spans
+        # opened in generators don't always close in the order they opened
+        _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.set(parent)
+            span.end_time = time.time_ns()
+            with self._lock:
+                self.spans.append(span)
+
+    def iterate(
+        self,
+        name: str,
+        iterable: Iterable[T],
+        attributes: Optional[dict[str, AttributeValue]] = None,
+    ) -> Iterator[T]:
+        """
+        Iterate within a span, which is only current whilst the iterable is
+        producing items.
+
+        Generators share their consumer's context, so a span opened inside one
+        would otherwise be current whilst the consumer handles each item too.
+        """
+        if not self.enabled:
+            yield from iterable
+            return
+
+        parent = _current_span.get()
+        iterator = iter(iterable)
+        try:
+            with self.span(name, attributes) as span:
+                while True:
+                    _current_span.set(span)
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        _current_span.set(parent)
+                    yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def submit(
+        self, executor: Executor, fn: Callable[..., R], *args: Any
+    ) -> "Future[R]":
+        """
+        Submit work to an executor, within the current span.
+        """
+        if not self.enabled:
+            return executor.submit(fn, *args)
+        return executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def to_otlp(self) -> dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": to_attributes(
+                            {
+                                "service.name": "heroku-audit",
+                                "service.version": __version__,
+                            }
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "heroku_audit", "version": __version__},
+                            "spans": [
+                                {
+                                    "traceId": self.trace_id,
+                                    "spanId": span.span_id,
+                                    "parentSpanId": span.parent_span_id or "",
+                                    "name": span.name,
+                                    "kind": span.kind,
+                                    "startTimeUnixNano": str(span.start_time),
+                                    "endTimeUnixNano": str(
+                                        span.end_time or span.start_time
+                                    ),
+                                    "attributes": to_attributes(span.attributes),
+                                    "status": (
+                                        {
+                                            "code": STATUS_CODE_ERROR,
+                                            "message": span.error,
+                                        }
+                                        if span.error is not None
+                                        else {}
+                                    ),
+                                }
+                                for span in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def export(self, path: Path) -> None:
+        # A single line, so the file can also be read as OTLP JSON Lines
+        path.write_text(json.dumps(self.to_otlp(), separators=(",", ":")) + "\n")
+
+
+tracer = Tracer()
@@ -0,0 +1,56 @@
+from typing import Any
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from heroku_audit.metrics import profiler
+
+# The API, and the Postgres and Redis APIs (including Postgres starter plans)
+API_HOST_COUNT = 4
+
+
+class CountingHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        profiler.record_connection(self.host)
+        super().connect()
+
+
+class CountingHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        profiler.record_connection(self.host)
+        super().connect()
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    Keep a pool of keep-alive connections to each API host, shared by every
+    fetch.
+
+    Each pool holds a connection for every worker, plus one for the main
+    thread. Requests wait for a pooled connection to be free, rather than
+    opening one which would be closed (and its TLS handshake wasted) as soon as
+    the response arrives.
+    """
+
+    def __init__(self, concurrency: int) -> None:
+        super().__init__(
+            pool_connections=API_HOST_COUNT,
+            pool_maxsize=concurrency + 1,
+            pool_block=True,
+        )
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
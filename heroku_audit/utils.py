@@ -1,50 +1,555 @@
+import math
 import sys
-from concurrent.futures import Executor
-from typing import Callable, Iterable
+import threading
+from collections import defaultdict
+from collections.abc import Collection
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    TypeVar,
+    cast,
+)
 
+import requests
 from heroku3.models.addon import Addon
 from heroku3.models.app import App
 from heroku3.models.collaborator import Collaborator
-from rich.progress import track
+from rich.progress import Progress, track
 
 from heroku_audit.client import heroku
+from heroku_audit.config import settings
+from heroku_audit.failures import Failure, failures
+from heroku_audit.metrics import get_endpoint, profiler
+from heroku_audit.snapshot import SnapshotMissingError
+from heroku_audit.tracing import tracer
 
 SHOW_PROGRESS = sys.stdout.isatty()
 COLLABORATOR_ROLES = {"collaborator", None}
 
+# The most items Heroku will return in a page
+PAGE_SIZE = 1000
+
+# Collections are split into ranges by the first few hex digits of their IDs
+ID_PREFIX_SIZE = 8
+ID_SPACE = 16**ID_PREFIX_SIZE
+MAX_SEGMENTS = 16
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+EXECUTOR_THREAD_PREFIX = "heroku-audit"
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# heroku3 models fetched so far in this run, by type and resource
+_models: dict[tuple[type, tuple[str, ...]], Any] = {}
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the executor shared by all fetches, sized by `--concurrency`
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.concurrency, thread_name_prefix=EXECUTOR_THREAD_PREFIX
+        )
+    return _executor
+
+
+def get_range(start: str = "", end: str = "", exclusive: bool = False) -> str:
+    return f"id {']' if exclusive else ''}{start}..{end}; max={PAGE_SIZE}"
+
+
+class IdRange(NamedTuple):
+    """
+    A range of IDs, made up to fetch part of a collection. `end` is inclusive,
+    and empty for the end of the collection.
+    """
+
+    start: str
+    end: str = ""
+    exclusive: bool = False
+
+    @property
+    def header(self) -> str:
+        return get_range(self.start, self.end, self.exclusive)
+
+    def is_after_start(self, item_id: str) -> bool:
+        return item_id > self.start if self.exclusive else item_id >= self.start
+
+
+class RangeNotSupportedError(Exception):
+    """
+    Heroku rejected or ignored a range it didn't provide itself.
+    """
+
+
+def get_range_pages(
+    url: str, page_range: Optional[str], id_range: Optional[IdRange] = None
+) -> list[dict]:
+    """
+    Fetch every item in a range, following `Next-Range` one page at a time.
+
+    For a made up `id_range`, raises `RangeNotSupportedError` if Heroku doesn't
+    honour it. `Next-Range` may not keep its end, so items past the end are
+    dropped, and paging stops once they're reached.
+    """
+    items: list[dict] = []
+    is_first_page = True
+    while page_range is not None:
+        response = heroku._session.get(url, headers={"Range": page_range})
+        page = response.json() if response.ok else []
+
+        if id_range is not None and is_first_page:
+            if 400 <= response.status_code < 500 or (
+                page and not id_range.is_after_start(page[0]["id"])
+            ):
+                raise RangeNotSupportedError(page_range)
+        is_first_page = False
+
+        response.raise_for_status()
+        if (
+            id_range is not None
+            and id_range.end
+            and page
+            and page[-1]["id"] > id_range.end
+        ):
+            items.extend(item for item in page if item["id"] <= id_range.end)
+            break
+        items.extend(page)
+        page_range = (
+            response.headers.get("Next-Range") if response.status_code == 206 else None
+        )
+    return items
+
+
+def split_range(last_id: str) -> list[IdRange]:
+    """
+    Split the IDs after `last_id` into ranges which can be fetched at once,
+    or none if they can't be split.
+
+    IDs are UUIDs, so are spread evenly. The first page started from the
+    lowest ID, so how far it reached shows how many more pages to expect.
+    """
+    try:
+        position = int(last_id[:ID_PREFIX_SIZE], 16)
+    except ValueError:
+        # Not a UUID, so the rest will have to be fetched in order
+        return []
+
+    covered = (position + 1) / ID_SPACE
+    segment_count = max(1, min(math.ceil((1 - covered) / covered), MAX_SEGMENTS))
+    if segment_count == 1:
+        return []
+
+    # The start of each range after the first, as the prefix of an ID
+    starts = [
+        position + 1 + (ID_SPACE - position - 1) * i // segment_count
+        for i in range(1, segment_count)
+    ]
+
+    def to_prefix(value: int) -> str:
+        return f"{value:0{ID_PREFIX_SIZE}x}"
+
+    # Ends are inclusive, so each range ends with the last ID before the next
+    ends = [to_prefix(start - 1) + "~" for start in starts]
+
+    return [
+        IdRange(last_id, ends[0], exclusive=True),
+        *(
+            IdRange(to_prefix(start), end)
+            for start, end in zip(starts, [*ends[1:], ""])
+        ),
+    ]
+
+
+def get_split_range_pages(url: str, id_range: IdRange) -> Optional[list[dict]]:
+    try:
+        return get_range_pages(url, id_range.header, id_range)
+    except RangeNotSupportedError:
+        return None
+
+
+def get_collection(resource: tuple[str, ...]) -> Iterator[dict]:
+    """
+    Fetch every item in a collection, as each page arrives.
+
+    Pages are as large as Heroku allows. If there's more than a full page, the
+    rest is split into ranges of IDs, which are fetched concurrently. Should
+    Heroku not honour those ranges, the rest is fetched in order instead,
+    following `Next-Range`. Items are only yielded once, in case ranges overlap.
+    """
+    url = heroku._url_for(*resource)  # type:ignore[attr-defined]
+
+    response = heroku._session.get(url, headers={"Range": get_range()})
+    response.raise_for_status()
+    items = response.json()
+    yield from items
+
+    next_range = response.headers.get("Next-Range")
+    if response.status_code != 206 or not items or next_range is None:
+        return
+
+    seen_ids = {item["id"] for item in items}
+
+    def get_new_items(range_items: list[dict]) -> Iterator[dict]:
+        for item in range_items:
+            if item["id"] not in seen_ids:
+                seen_ids.add(item["id"])
+                yield item
+
+    id_ranges = split_range(items[-1]["id"]) if len(items) == PAGE_SIZE else []
+    all_fetched = bool(id_ranges)
+    for _range, range_items in zip_map(partial(get_split_range_pages, url), id_ranges):
+        if range_items is None:
+            all_fetched = False
+        else:
+            yield from get_new_items(range_items)
+
+    if not all_fetched:
+        yield from get_new_items(get_range_pages(url, next_range))
+
+
+def get_resources(resource: tuple[str, ...], obj: type[T]) -> list[T]:
+    """
+    Fetch a collection as heroku3 models, like `heroku._get_resources`.
+
+    Each collection is only fetched and parsed once per run, however many
+    reports need it.
+    """
+    key = (obj, resource)
+    if key not in _models:
+        models = [
+            obj.new_from_dict(item, h=heroku)  # type:ignore[attr-defined]
+            for item in get_collection(resource)
+        ]
+
+        if obj is App:
+            for app in models:
+                _models[(App, ("apps", app.name))] = app
+
+        _models[key] = models
+
+    return list(_models[key])
+
+
+def get_app(app_name: str) -> App:
+    key = (App, ("apps", app_name))
+    if key not in _models:
+        _models[key] = heroku.app(app_name)
+    return cast(App, _models[key])
+
 
 def get_apps_for_teams(team: str) -> list[App]:
-    return heroku._get_resources(  # type:ignore[attr-defined,no-any-return]
-        ("teams", team, "apps"), App
-    )
+    return get_resources(("teams", team, "apps"), App)
+
+
+def get_apps(team: Optional[str] = None) -> list[App]:
+    with profiler.stage("get_apps"):
+        return (
+            get_resources(("apps",), App) if team is None else get_apps_for_teams(team)
+        )
 
 
 def get_team_members(team: str) -> list[Collaborator]:
     return [
         member
-        for member in heroku._get_resources(  # type:ignore[attr-defined]
-            ("teams", team, "members"), obj=Collaborator
-        )
+        for member in get_resources(("teams", team, "members"), Collaborator)
         if member.role not in COLLABORATOR_ROLES
     ]
 
 
+def get_team_membership(teams: Collection[str]) -> dict[str, dict[str, Collaborator]]:
+    """
+    Index the members of the given teams by email, then team.
+
+    Each team is only fetched once, however many users are being looked up.
+    """
+    membership: dict[str, dict[str, Collaborator]] = defaultdict(dict)
+
+    for team_name, members in track(
+        zip_map(get_team_members, teams),
+        description="Loading team members...",
+        total=len(teams),
+        disable=not SHOW_PROGRESS,
+    ):
+        for member in members:
+            membership[member.user.email][team_name] = member
+
+    return membership
+
+
 def get_addon_plan(addon: Addon) -> str:
     return addon.plan.name.split(":", 1)[-1]
 
 
-def zip_map(executor: Executor, fn: Callable, iterable: Iterable) -> Iterable:
+def get_span_attributes(item: object) -> dict[str, Any]:
     """
-    Concurrently maps `list[T]` to `list[(T, fn(T))]`
+    Identify the app (and addon) an item of work is for, to find the slow tail.
     """
-    yield from executor.map(lambda a: (a, fn(a)), iterable)
+    if isinstance(item, App):
+        return {"heroku.app.name": item.name}
+    elif isinstance(item, Addon):
+        return {"heroku.app.name": item.app.name, "heroku.addon.name": item.name}
+    return {}
 
 
-def get_addons(executor: Executor, apps: list[App]) -> Iterable[Addon]:
-    for app_addons in track(
-        executor.map(App.addons, apps),
-        description="Fetching addons...",
-        total=len(apps),
-        disable=not SHOW_PROGRESS,
-    ):
-        yield from app_addons
+def capture_failure(item: object, error: Exception, fn: Callable) -> bool:
+    """
+    With `--keep-going`, record an app or addon which couldn't be fetched,
+    rather than aborting the report. Returns whether it was recorded.
+
+    Failures of anything else (eg a page of a listing) still abort, as they'd
+    leave apps silently missing.
+    """
+    # A snapshot missing a resource isn't a problem with the app
+    if not settings.keep_going or isinstance(error, SnapshotMissingError):
+        return False
+
+    if isinstance(item, App):
+        app_name, addon_name = item.name, ""
+    elif isinstance(item, Addon):
+        app_name, addon_name = item.app.name, item.name
+    else:
+        return False
+
+    # Requests' errors carry the request, and the response if there was one
+    response = getattr(error, "response", None)
+    url = getattr(
+        response if response is not None else getattr(error, "request", None),
+        "url",
+        None,
+    )
+
+    failures.record(
+        Failure(
+            app=app_name,
+            addon=addon_name,
+            stage=get_endpoint(url) if url else getattr(fn, "__name__", ""),
+            status=str(response.status_code)
+            if response is not None
+            else type(error).__name__,
+            error=response.reason if response is not None else str(error),
+        )
+    )
+    return True
+
+
+def zip_map(fn: Callable[[T], R], iterable: Iterable[T]) -> Iterator[tuple[T, R]]:
+    """
+    Concurrently maps `list[T]` to `list[(T, fn(T))]`, in order of completion.
+
+    Only a bounded number of items are in flight at once, so memory use stays
+    flat regardless of how many items there are.
+
+    When called from one of the executor's own workers, items are mapped in
+    that thread instead, as waiting on the executor from inside it could
+    deadlock.
+    """
+    if threading.current_thread().name.startswith(EXECUTOR_THREAD_PREFIX):
+        for item in iterable:
+            try:
+                result = fn(item)
+            except Exception as e:
+                if not capture_failure(item, e, fn):
+                    raise
+                continue
+            yield item, result
+        return
+
+    yield from profiler.stage_iter("zip_map", _zip_map(fn, iterable))
+
+
+def _zip_map(fn: Callable[[T], R], iterable: Iterable[T]) -> Iterator[tuple[T, R]]:
+    executor = get_executor()
+    max_pending = settings.concurrency * 2
+    pending: dict[Future[R], T] = {}
+
+    def call(item: T) -> R:
+        with tracer.span("zip_map.item", get_span_attributes(item)):
+            return fn(item)
+
+    def complete() -> Iterator[tuple[T, R]]:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            item = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                if not capture_failure(item, e, fn):
+                    raise
+                continue
+            yield item, result
+
+    try:
+        for item in iterable:
+            pending[tracer.submit(executor, call, item)] = item
+
+            if len(pending) >= max_pending:
+                yield from complete()
+
+        while pending:
+            yield from complete()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def read_list_file(path: Path) -> list[str]:
+    """
+    Read a file of values, one per line, ignoring blank lines and `#` comments.
+    """
+    return [
+        line
+        for line in (raw_line.strip() for raw_line in path.read_text().splitlines())
+        if line and not line.startswith("#")
+    ]
+
+
+def list_addons(resource: tuple[str, ...], apps: list[App]) -> Optional[list[Addon]]:
+    """
+    List addons in bulk, keeping those belonging to the given apps.
+
+    Returns `None` if the listing isn't allowed, eg for a team we aren't an
+    admin of.
+    """
+    apps_by_id = {app.id: app for app in apps}
+
+    try:
+        items = list(get_collection(resource))
+    except requests.HTTPError:
+        return None
+
+    return [
+        Addon.new_from_dict(item, h=heroku, app=apps_by_id[item["app"]["id"]])  # type:ignore[attr-defined]
+        for item in items
+        if item["app"]["id"] in apps_by_id
+    ]
+
+
+def get_addon_listings(apps: list[App]) -> Iterator[tuple[list[App], list[Addon]]]:
+    """
+    Concurrently list the addons of the given apps, in order of completion,
+    along with the apps each listing covers.
+
+    Addons are listed in bulk for each team, or the whole account when there
+    are personal apps, rather than with a request per app. Apps which can't be
+    listed in bulk fall back to a request each.
+    """
+    apps_by_team: dict[Optional[str], list[App]] = defaultdict(list)
+    for app in apps:
+        apps_by_team[app.team.name if app.team is not None else None].append(app)
+
+    sources: dict[tuple[str, ...], list[App]] = (
+        {("addons",): apps}
+        if None in apps_by_team
+        else {
+            ("teams", team_name, "addons"): team_apps
+            for team_name, team_apps in apps_by_team.items()
+            if team_name is not None
+        }
+    )
+
+    if len(sources) >= len(apps):
+        unlisted_apps = apps
+    else:
+        unlisted_apps = []
+        for (_resource, source_apps), addons in zip_map(
+            lambda source: list_addons(*source), sources.items()
+        ):
+            if addons is None:
+                unlisted_apps.extend(source_apps)
+            else:
+                yield source_apps, addons
+
+    for app, addons in zip_map(App.addons, unlisted_apps):
+        yield [app], addons
+
+
+def get_addons(apps: list[App]) -> Iterable[Addon]:
+    with Progress(disable=not SHOW_PROGRESS) as progress:
+        task = progress.add_task("Fetching addons...", total=len(apps))
+        for listed_apps, addons in profiler.stage_iter(
+            "get_addons", get_addon_listings(apps)
+        ):
+            progress.advance(task, len(listed_apps))
+            yield from addons
+
+
+def probe_addons(
+    apps: list[App], prefix: str, probe: Callable[[Addon], R]
+) -> Iterator[tuple[Addon, R]]:
+    """
+    Concurrently run `probe` on every addon whose plan starts with `prefix`,
+    in order of completion.
+
+    Listing addons and probing them are pipelined: addons are probed as soon
+    as their listing arrives, rather than once every app has been listed. Only
+    a bounded number of probes are in flight, and listing pauses while they
+    catch up.
+    """
+    yield from profiler.stage_iter("probe_addons", _probe_addons(apps, prefix, probe))
+
+
+def _probe_addons(
+    apps: list[App], prefix: str, probe: Callable[[Addon], R]
+) -> Iterator[tuple[Addon, R]]:
+    executor = get_executor()
+    max_pending = settings.concurrency * 2
+    probes: dict[Future[R], Addon] = {}
+
+    def call(addon: Addon) -> R:
+        with tracer.span("probe_addons.probe", get_span_attributes(addon)):
+            return probe(addon)
+
+    with Progress(disable=not SHOW_PROGRESS) as progress:
+        listing_task = progress.add_task("Fetching addons...", total=len(apps))
+        probe_task = progress.add_task("Probing databases...", total=0)
+        probe_count = 0
+
+        def complete(
+            timeout: Optional[float] = None,
+        ) -> Iterator[tuple[Addon, R]]:
+            done, _ = wait(probes, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                addon = probes.pop(future)
+                progress.advance(probe_task)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not capture_failure(addon, e, probe):
+                        raise
+                    continue
+                yield addon, result
+
+        try:
+            for listed_apps, addons in get_addon_listings(apps):
+                progress.advance(listing_task, len(listed_apps))
+
+                for addon in addons:
+                    if not addon.plan.name.startswith(prefix):
+                        continue
+
+                    probes[tracer.submit(executor, call, addon)] = addon
+                    probe_count += 1
+                    progress.update(probe_task, total=probe_count)
+
+                    if len(probes) >= max_pending:
+                        yield from complete()
+
+                # Report whichever probes have finished in the meantime
+                yield from complete(timeout=0)
+
+            while probes:
+                yield from complete()
+        finally:
+            for future in probes:
+                future.cancel()
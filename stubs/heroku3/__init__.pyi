@@ -1,3 +1,5 @@
+from requests import Session
+
 from .core import Heroku
 
-def from_key(api_key: str) -> Heroku: ...
+def from_key(api_key: str, session: Session | None = None) -> Heroku: ...
@@ -5,5 +5,6 @@ from .models.app import App
 class Heroku:
     _session: Session
 
+    def __init__(self, session: Session | None = None) -> None: ...
     def apps(self) -> list[App]: ...
     def app(self, id_or_name: str) -> App: ...
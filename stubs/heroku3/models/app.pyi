@@ -1,12 +1,22 @@
+from datetime import datetime
+from typing import Optional
+
 from . import Team
 from .addon import Addon
 from .collaborator import Collaborator
+from .configvars import ConfigVars
 from .domains import Domain
+from .formation import Formation
 
 class App:
+    id: str  # noqa:A003
     name: str
     team: Team
+    updated_at: datetime
+    released_at: Optional[datetime]
 
     def addons(self) -> list[Addon]: ...
     def collaborators(self) -> list[Collaborator]: ...
+    def config(self) -> ConfigVars: ...
     def domains(self) -> list[Domain]: ...
+    def process_formation(self) -> list[Formation]: ...
@@ -0,0 +1,2 @@
+class ConfigVars:
+    def to_dict(self) -> dict[str, str]: ...
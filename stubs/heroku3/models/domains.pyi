@@ -1,6 +1,9 @@
 from typing import Optional
 
+from .app import App
+
 class Domain:
     hostname: str
     cname: str
     acm_status: Optional[str]
+    app: App
@@ -0,0 +1,5 @@
+class Formation:
+    type: str  # noqa:A003
+    size: str
+    quantity: int
+    command: str
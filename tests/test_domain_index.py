@@ -0,0 +1,113 @@
+import os
+import stat
+from pathlib import Path
+
+from heroku_audit.index import (
+    AppDomains,
+    DomainIndex,
+    DomainMatch,
+    DomainRecord,
+    DomainTrie,
+)
+
+
+def get_domain(hostname: str) -> DomainRecord:
+    return {"hostname": hostname, "cname": None, "acm_status": None}
+
+
+def get_trie(*domains: tuple[str, str]) -> DomainTrie:
+    trie = DomainTrie()
+    for app_name, hostname in domains:
+        trie.add(DomainMatch(app_name, get_domain(hostname)))
+    return trie
+
+
+def get_owners(matches: list[DomainMatch]) -> set[tuple[str, str]]:
+    return {(m.app_name, m.domain["hostname"]) for m in matches}
+
+
+def test_who_owns_exact() -> None:
+    trie = get_trie(("app-1", "www.example.com"), ("app-2", "example.com"))
+
+    assert get_owners(trie.who_owns("www.example.com")) == {
+        ("app-1", "www.example.com")
+    }
+    assert get_owners(trie.who_owns("example.com")) == {("app-2", "example.com")}
+    assert trie.who_owns("example.org") == []
+    assert trie.who_owns("other.example.com") == []
+
+
+def test_who_owns_ignores_case_and_trailing_dot() -> None:
+    trie = get_trie(("app-1", "WWW.Example.com"))
+
+    assert get_owners(trie.who_owns("www.example.com.")) == {
+        ("app-1", "WWW.Example.com")
+    }
+
+
+def test_who_owns_wildcard() -> None:
+    trie = get_trie(("app-1", "*.example.com"), ("app-2", "www.example.com"))
+
+    # Both the exact domain and the wildcard route it
+    assert get_owners(trie.who_owns("www.example.com")) == {
+        ("app-1", "*.example.com"),
+        ("app-2", "www.example.com"),
+    }
+    assert get_owners(trie.who_owns("api.example.com")) == {("app-1", "*.example.com")}
+
+
+def test_who_owns_wildcard_covers_a_single_label() -> None:
+    trie = get_trie(("app-1", "*.example.com"))
+
+    # Not the apex, nor anything more than one label below it
+    assert trie.who_owns("example.com") == []
+    assert trie.who_owns("a.b.example.com") == []
+
+
+def test_who_owns_wildcard_itself() -> None:
+    trie = get_trie(("app-1", "*.example.com"))
+
+    assert get_owners(trie.who_owns("*.example.com")) == {("app-1", "*.example.com")}
+
+
+def test_under() -> None:
+    trie = get_trie(
+        ("app-1", "example.com"),
+        ("app-2", "www.example.com"),
+        ("app-3", "*.api.example.com"),
+        ("app-4", "example.org"),
+        ("app-5", "notexample.com"),
+    )
+
+    assert get_owners(list(trie.under("example.com"))) == {
+        ("app-1", "example.com"),
+        ("app-2", "www.example.com"),
+        ("app-3", "*.api.example.com"),
+    }
+    assert list(trie.under("missing.example.com")) == []
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    path = tmp_path / "domain-index.json"
+    apps: dict[str, AppDomains] = {
+        "app-1": {
+            "team": "team-1",
+            "version": "v1",
+            "indexed_at": 0.0,
+            "domains": [get_domain("www.example.com")],
+        }
+    }
+
+    # A leftover temporary file doesn't keep its permissions
+    leftover = path.with_suffix(".tmp")
+    leftover.write_text("")
+    leftover.chmod(0o644)
+
+    DomainIndex(apps).save(path)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    index = DomainIndex.load(path)
+    assert index.apps == apps
+    assert get_owners(index.trie.who_owns("www.example.com")) == {
+        ("app-1", "www.example.com")
+    }
@@ -0,0 +1,146 @@
+import stat
+from pathlib import Path
+
+import pytest
+import requests
+
+from heroku_audit.index import SALT_SIZE
+from heroku_audit.journal import Journal, JournalError, get_journal_path
+
+API_KEY = "00000000-0000-0000-0000-000000000000"
+
+
+def get_response(body: bytes, status: int = 200) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update({"Content-Type": "application/json"})
+    response._content = body
+    return response
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> Path:
+    return tmp_path / "journals" / "run.journal"
+
+
+def record(path: Path, responses: dict[str, requests.Response]) -> None:
+    journal = Journal(path, API_KEY)
+    for key, response in responses.items():
+        journal.record(key, response)
+    journal.close()
+
+
+def test_resume(path: Path) -> None:
+    record(
+        path,
+        {
+            "GET /apps": get_response(b'[{"name": "app"}]'),
+            "GET /apps/app/config-vars": get_response(b'{"SECRET": "value"}'),
+            "GET /apps/missing": get_response(b'{"id": "not_found"}', 404),
+        },
+    )
+
+    journal = Journal(path, API_KEY, resume=True)
+
+    assert journal.response_count == 3
+    cached = journal.get("GET /apps/app/config-vars")
+    assert cached is not None
+    assert cached.status == 200
+    assert cached.headers["Content-Type"] == "application/json"
+    assert cached.body == b'{"SECRET": "value"}'
+    missing = journal.get("GET /apps/missing")
+    assert missing is not None
+    assert missing.status == 404
+    assert journal.get("GET /teams") is None
+
+
+def test_encrypted(path: Path) -> None:
+    record(path, {"GET /apps/app/config-vars": get_response(b'{"SECRET": "value"}')})
+
+    assert b"SECRET" not in path.read_bytes()
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert stat.S_IMODE(path.parent.stat().st_mode) == 0o700
+
+
+def test_resume_wrong_key(path: Path) -> None:
+    record(path, {"GET /apps": get_response(b"[]")})
+
+    journal = Journal(path, "another-key", resume=True)
+
+    assert journal.response_count == 0
+    assert journal.get("GET /apps") is None
+    journal.close()
+    # Responses which can't be read are dropped, rather than resumed after
+    assert path.stat().st_size == SALT_SIZE
+
+
+@pytest.mark.parametrize("damage", ["truncate", "tamper"])
+def test_resume_damaged(path: Path, damage: str) -> None:
+    record(
+        path,
+        {
+            "GET /apps": get_response(b"[]"),
+            "GET /teams": get_response(b"[]"),
+        },
+    )
+    content = path.read_bytes()
+    if damage == "truncate":
+        # eg the previous run was interrupted mid-write
+        content = content[:-10]
+    else:
+        last_line_start = content.rindex(b"\n", 0, -1) + 1
+        content = content[:last_line_start] + b"x" + content[last_line_start + 1 :]
+    path.write_bytes(content)
+
+    journal = Journal(path, API_KEY, resume=True)
+
+    assert journal.get("GET /apps") is not None
+    assert journal.get("GET /teams") is None
+    assert journal.response_count == 1
+
+    # New responses are appended after the last good one
+    journal.record("GET /teams", get_response(b"[]"))
+    journal.close()
+    resumed = Journal(path, API_KEY, resume=True)
+    assert resumed.response_count == 2
+    resumed.close()
+
+
+def test_without_resume(path: Path) -> None:
+    record(path, {"GET /apps": get_response(b"[]")})
+
+    journal = Journal(path, API_KEY)
+
+    assert journal.response_count == 0
+    journal.close()
+    assert path.stat().st_size == SALT_SIZE
+
+
+def test_locked(path: Path) -> None:
+    journal = Journal(path, API_KEY)
+
+    with pytest.raises(JournalError):
+        Journal(path, API_KEY, resume=True)
+
+    journal.close()
+    Journal(path, API_KEY, resume=True).close()
+
+
+def test_delete(path: Path) -> None:
+    journal = Journal(path, API_KEY)
+    journal.delete()
+
+    assert journal.closed
+    assert not path.exists()
+    # Responses arriving after the run finished are ignored
+    journal.record("GET /apps", get_response(b"[]"))
+
+
+def test_get_journal_path() -> None:
+    path = get_journal_path(API_KEY, ["apps", "count"])
+
+    assert path == get_journal_path(API_KEY, ["apps", "count"])
+    assert path != get_journal_path(API_KEY, ["apps", "list"])
+    assert path != get_journal_path("another-key", ["apps", "count"])
+    # Arguments are kept apart, rather than joined together
+    assert path != get_journal_path(API_KEY, ["apps", "coun", "t"])
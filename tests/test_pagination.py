@@ -0,0 +1,209 @@
+import json
+import random
+import re
+import uuid
+from typing import Any, Optional
+
+import pytest
+import requests
+
+from heroku_audit import utils
+from heroku_audit.utils import (
+    ID_PREFIX_SIZE,
+    MAX_SEGMENTS,
+    PAGE_SIZE,
+    IdRange,
+    get_collection,
+    split_range,
+)
+
+RANGE_RE = re.compile(
+    r"^id (?P<exclusive>\]?)(?P<start>[^.]*)\.\.(?P<end>[^;]*); max=(?P<max>\d+)$"
+)
+
+
+def get_uuids(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return sorted(str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(count))
+
+
+def is_in_range(item_id: str, id_range: IdRange) -> bool:
+    return id_range.is_after_start(item_id) and (
+        not id_range.end or item_id <= id_range.end
+    )
+
+
+class FakeSession:
+    """
+    Pages through a collection like Heroku does, using `Range` and `Next-Range`.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        max_page_size: int = PAGE_SIZE,
+        drop_end: bool = False,
+        reject_made_up: bool = False,
+        ignore_made_up: bool = False,
+    ) -> None:
+        self.ids = sorted(ids)
+        self.max_page_size = max_page_size
+        self.drop_end = drop_end
+        self.reject_made_up = reject_made_up
+        self.ignore_made_up = ignore_made_up
+        self.next_ranges: set[str] = set()
+        self.ranges: list[str] = []
+
+    def get(self, url: str, headers: dict[str, str]) -> requests.Response:
+        page_range = headers["Range"]
+        self.ranges.append(page_range)
+        match = RANGE_RE.match(page_range)
+        assert match is not None
+
+        # Ranges which weren't the first page, nor given as a Next-Range
+        made_up = bool(match["start"]) and page_range not in self.next_ranges
+        if made_up and self.reject_made_up:
+            return self.get_response(416, [])
+
+        id_range = IdRange(match["start"], match["end"], bool(match["exclusive"]))
+        if made_up and self.ignore_made_up:
+            id_range = IdRange("")
+
+        ids = [item_id for item_id in self.ids if is_in_range(item_id, id_range)]
+        page = ids[: min(int(match["max"]), self.max_page_size)]
+        if len(page) == len(ids):
+            return self.get_response(200, page)
+
+        end = "" if self.drop_end else id_range.end
+        next_range = f"id ]{page[-1]}..{end}; max={match['max']}"
+        self.next_ranges.add(next_range)
+        return self.get_response(206, page, {"Next-Range": next_range})
+
+    def get_response(
+        self, status: int, ids: list[str], headers: Optional[dict[str, str]] = None
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers or {})
+        response._content = json.dumps([{"id": item_id} for item_id in ids]).encode()
+        return response
+
+
+class FakeHeroku:
+    def __init__(self, session: FakeSession) -> None:
+        self._session = session
+
+    def _url_for(self, *args: Any) -> str:
+        return "https://api.heroku.com/" + "/".join(args)
+
+
+def fetch(monkeypatch: pytest.MonkeyPatch, session: FakeSession) -> list[str]:
+    monkeypatch.setattr(utils, "heroku", FakeHeroku(session))
+    return [item["id"] for item in get_collection(("apps",))]
+
+
+def test_split_range_not_uuids() -> None:
+    assert split_range("app-00001") == []
+
+
+def test_split_range_nearly_finished() -> None:
+    # The first page reached over half way, so there's one page left at most
+    assert split_range("c0000000-0000-0000-0000-000000000000") == []
+
+
+@pytest.mark.parametrize(
+    "last_id",
+    [
+        "00000000-0000-0000-0000-000000000000",
+        "00000fff-ffff-ffff-ffff-ffffffffffff",
+        "0fffffff-0000-0000-0000-000000000000",
+        "3a7c1e22-9b0d-4c1f-8e6a-2d5b7f9c0e11",
+    ],
+)
+def test_split_range_disjoint(last_id: str) -> None:
+    id_ranges = split_range(last_id)
+
+    assert 1 < len(id_ranges) <= MAX_SEGMENTS
+    assert id_ranges[0].start == last_id
+    assert id_ranges[0].exclusive
+    assert id_ranges[-1].end == ""
+
+    # Each range starts just after the previous one ends
+    for previous, id_range in zip(id_ranges, id_ranges[1:]):
+        assert previous.end < id_range.start
+        assert int(previous.end[:ID_PREFIX_SIZE], 16) + 1 == int(id_range.start, 16)
+
+    # Every ID after the last one is in exactly one range, including those at
+    # the boundaries between them
+    boundary_ids = [
+        f"{id_range.start}-{suffix}"
+        for id_range in id_ranges[1:]
+        for suffix in ["0000-0000-0000-000000000000", "ffff-ffff-ffff-ffffffffffff"]
+    ] + [
+        f"{id_range.end[:-1]}-ffff-ffff-ffff-ffffffffffff"
+        for id_range in id_ranges[:-1]
+    ]
+    for item_id in [*boundary_ids, *get_uuids(2000)]:
+        matching = [r for r in id_ranges if is_in_range(item_id, r)]
+        assert len(matching) == (item_id > last_id), item_id
+
+    assert not any(is_in_range(last_id, r) for r in id_ranges)
+
+
+@pytest.mark.parametrize("count", [0, 10, PAGE_SIZE, PAGE_SIZE + 1, 5000])
+def test_get_collection(monkeypatch: pytest.MonkeyPatch, count: int) -> None:
+    ids = get_uuids(count)
+    session = FakeSession(ids)
+
+    assert sorted(fetch(monkeypatch, session)) == ids
+
+
+def test_get_collection_splits_after_full_page(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    session = FakeSession(get_uuids(5000))
+    fetch(monkeypatch, session)
+
+    made_up = [r for r in session.ranges[1:] if r not in session.next_ranges]
+    assert len(made_up) > 1
+
+
+def test_get_collection_next_range_drops_end(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    ids = get_uuids(5000)
+    session = FakeSession(ids, drop_end=True)
+
+    fetched = fetch(monkeypatch, session)
+
+    assert sorted(fetched) == ids
+    # Ranges stop at their end, rather than paging on through the rest
+    assert len(session.ranges) <= len(FakeSession(ids).ranges) + MAX_SEGMENTS
+    assert len(session.ranges) < 20
+
+
+@pytest.mark.parametrize("option", ["reject_made_up", "ignore_made_up"])
+def test_get_collection_made_up_ranges_not_honoured(
+    monkeypatch: pytest.MonkeyPatch, option: str
+) -> None:
+    ids = get_uuids(5000)
+    session = FakeSession(ids, **{option: True})
+
+    assert sorted(fetch(monkeypatch, session)) == ids
+
+
+def test_get_collection_not_uuids(monkeypatch: pytest.MonkeyPatch) -> None:
+    ids = [f"app-{i:05}" for i in range(2500)]
+    session = FakeSession(ids)
+
+    assert fetch(monkeypatch, session) == ids
+    assert all(r in session.next_ranges for r in session.ranges[1:])
+
+
+def test_get_collection_smaller_pages(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Heroku returned less than a full page, so its Next-Range is followed
+    ids = get_uuids(2500)
+    session = FakeSession(ids, max_page_size=200)
+
+    assert fetch(monkeypatch, session) == ids
+    assert all(r in session.next_ranges for r in session.ranges[1:])
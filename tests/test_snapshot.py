@@ -0,0 +1,93 @@
+from heroku_audit.snapshot import (
+    Change,
+    Record,
+    Snapshot,
+    diff_records,
+    iter_records,
+)
+
+
+def test_diff_records_unchanged() -> None:
+    records = [Record.create("app", "app-1", {"stack": "heroku-24"})]
+
+    assert list(diff_records(iter(records), iter(records))) == []
+
+
+def test_diff_records_added_removed_and_changed() -> None:
+    old = [
+        Record.create("app", "app-1", {"stack": "heroku-22"}),
+        Record.create("app", "app-2", {"stack": "heroku-24"}),
+    ]
+    new = [
+        Record.create("app", "app-1", {"stack": "heroku-24"}),
+        Record.create("app", "app-3", {"stack": "heroku-24"}),
+    ]
+
+    changes = {
+        (change.change, change.record.key): change
+        for change in diff_records(iter(old), iter(new))
+    }
+
+    assert set(changes) == {
+        (Change.CHANGED, "app-1"),
+        (Change.ADDED, "app-3"),
+        (Change.REMOVED, "app-2"),
+    }
+    assert changes[(Change.CHANGED, "app-1")].details == (
+        "stack: heroku-22 -> heroku-24"
+    )
+    assert changes[(Change.ADDED, "app-3")].details == "stack: heroku-24"
+
+
+def test_diff_records_compares_kind_and_key() -> None:
+    old = [Record.create("collaborator", "app-1/a@example.com", {"role": None})]
+    new = [Record.create("team-member", "app-1/a@example.com", {"role": None})]
+
+    assert {c.change for c in diff_records(iter(old), iter(new))} == {
+        Change.ADDED,
+        Change.REMOVED,
+    }
+
+
+def test_diff_records_ignores_duplicates() -> None:
+    record = Record.create("domain", "app-1/example.com", {"cname": None})
+
+    assert list(diff_records(iter([]), iter([record, record]))) == [
+        (Change.ADDED, record, None)
+    ]
+
+
+def test_diff_records_hides_secret_values() -> None:
+    old = [Record.create("config-var", "app-1/SECRET", {"value": "a"}, secret=True)]
+    new = [Record.create("config-var", "app-1/SECRET", {"value": "b"}, secret=True)]
+
+    (change,) = diff_records(iter(old), iter(new))
+
+    assert change.change == Change.CHANGED
+    assert change.details == ""
+    assert "b" not in repr(change.record.fields)
+
+
+def test_iter_records() -> None:
+    snapshot = Snapshot(
+        responses={
+            "https://api.heroku.com/apps/app-1/config-vars": {
+                "status": 200,
+                "body": {"SECRET": "value"},
+            },
+            "https://api.heroku.com/apps/app-1/domains": {
+                "status": 200,
+                "body": [
+                    {"hostname": "example.com", "cname": None, "acm_status": None}
+                ],
+            },
+        }
+    )
+
+    records = {(r.kind, r.key): r for r in iter_records(snapshot)}
+
+    assert set(records) == {
+        ("config-var", "app-1/SECRET"),
+        ("domain", "app-1/example.com"),
+    }
+    assert records[("config-var", "app-1/SECRET")].fields == {}